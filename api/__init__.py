@@ -2,4 +2,5 @@ from api.auth import router as auth_router
 from api.jobs import router as jobs_router
 from api.task_queue import router as task_router
 from api.proposals import router as proposals_router
-from api.prompts import router as prompts_router
\ No newline at end of file
+from api.prompts import router as prompts_router
+from api.usage import router as usage_router
\ No newline at end of file
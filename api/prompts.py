@@ -10,8 +10,6 @@ router = APIRouter(prefix="/prompts", tags=["prompts"])
 async def update_proposal_prompt_api(prompt_text:str, user = Depends(require_auth),state:AppState = Depends(get_app_state)):
     try:
         new_version = await state.prompt_archive.add_prompt("proposal", prompt_text)
-        async with state.prompt_lock:
-            state.proposal_prompt_changed = True
         return {"status" : "Done", "value" : f"Prompt updated to version {new_version}"}
     except Exception as e:
         return {"status" : "Failed", "message" : str(e)}
@@ -46,8 +44,6 @@ async def rollback_proposal_prompt_api(version:int, user = Depends(require_auth)
                 )
         else:
             await state.prompt_archive.rollback("proposal", version)
-        async with state.prompt_lock:
-            state.proposal_prompt_changed = True
         return {"status" : "Done", "value" : f"Rolled back to {version}"}
     except Exception as e:
         return {"status" : "Failed", "message" : str(e)}
@@ -1,14 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Optional
 from db.pool import get_pool
 from security_utils.auth_utils import require_auth
-import asyncio
 import json
+import os
 import traceback
 from state import get_app_state
-from upwork_agent.bidder_agent import generate_proposal_for_job
-from db.jobs import change_proposal_generation_status, get_job_by_url
+from db.jobs import change_proposal_generation_status, get_job_by_url, select_jobs_for_generation, reset_failed_generation, mark_job_processing
+from db.generation_runs import create_generation_run, get_generation_run
+from db.proposal_cache import get_proposal_cache_stats, evict_cached_proposals, PROPOSAL_CACHE_MAX_AGE
+from db.llm_cache import get_llm_cache_stats
+from db.queue_manager import enqueue_task
+from upwork_agent.bulk_generation import enqueue_bulk_generation, generate_proposal_task_key, GENERATE_PROPOSAL_TASK
+from worker.supervisor import parse_concurrency_limits, DEFAULT_GROUP_LIMIT
 from db.proposals import get_proposal_by_url, update_proposal_by_url
+from db.llm_usage import get_prompt_cache_stats
 from utils.models import Proposal as ProposalModel
 
 print("Jobs API Loaded")
@@ -20,16 +28,121 @@ class SaveProposalRequest(BaseModel):
     proposal: ProposalModel
     profile: str = "general_profile"
 
+class BulkGenerateRequest(BaseModel):
+    statuses: Optional[list[str]] = None
+    created_from: Optional[datetime] = None
+    created_to: Optional[datetime] = None
+    job_urls: Optional[list[str]] = None
+    # Regenerate every matching proposal not made with the active prompt version
+    stale_prompt: bool = False
+    limit: int = Field(500, ge=1, le=5000)
+
 @router.post("/generate_proposal")
-async def generate_proposal_api(job_url:str, user = Depends(require_auth),state = Depends(get_app_state)):
+async def generate_proposal_api(job_url:str, regenerate:bool = False, user = Depends(require_auth),state = Depends(get_app_state)):
     try:
-        await change_proposal_generation_status(job_url, "processing")
-        asyncio.create_task(generate_proposal_for_job(state, job_url))
-        return {"status" : "Processing", "message" : f"Proposal generation started for {job_url}. It will be available in the proposals list once done."}
+        # Generation runs as a queue task in the worker, so it survives restarts and is retried on failure
+        status, marked = await mark_job_processing(job_url)
+        if not status:
+            return {"status" : "Failed", "message" : marked}
+        if not marked["found"]:
+            raise HTTPException(status_code=404, detail="Job not found")
+        previous_status = marked["previous_status"]
+        status, result = await enqueue_task(
+            GENERATE_PROPOSAL_TASK,
+            user,
+            json.dumps({"job_url": job_url, "replace": regenerate, "previous_status": previous_status}),
+            idempotency_key=generate_proposal_task_key(job_url),
+        )
+        if not status:
+            await reset_failed_generation(job_url, previous_status)
+            return {"status" : "Failed", "message" : result}
+        return {
+            "status" : "Processing",
+            "task_id" : result["task_id"],
+            "message" : f"Proposal generation queued for {job_url}. It will be available in the proposals list once done."
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         traceback.print_exc()
         return {"status" : "Failed", "message" : str(e)}
 
+@router.post("/generate_bulk")
+async def generate_bulk_api(payload: BulkGenerateRequest, user = Depends(require_auth), state = Depends(get_app_state)):
+    try:
+        statuses = payload.statuses
+        if statuses is None and not payload.job_urls:
+            # Fresh jobs by default; a prompt change targets proposals already generated
+            statuses = ["generated"] if payload.stale_prompt else ["pending"]
+        _, prompt_version = await state.prompt_archive.get_active_prompt_with_version("proposal")
+        status, jobs = await select_jobs_for_generation(
+            statuses=statuses,
+            created_from=payload.created_from,
+            created_to=payload.created_to,
+            job_urls=payload.job_urls,
+            stale_prompt_version=prompt_version if payload.stale_prompt else None,
+            limit=payload.limit,
+        )
+        if not status:
+            raise HTTPException(status_code=500, detail=jobs)
+        filters = payload.model_dump(exclude={"limit"})
+        filters["statuses"] = statuses
+        # Generations run in the worker, as many at a time as its generate_proposal limit allows
+        concurrency = parse_concurrency_limits(os.getenv("TASK_CONCURRENCY")).get(GENERATE_PROPOSAL_TASK, DEFAULT_GROUP_LIMIT)
+        status, run_id = await create_generation_run(user, filters, prompt_version, concurrency, len(jobs))
+        if not status:
+            raise HTTPException(status_code=500, detail=run_id)
+        status, result = await enqueue_bulk_generation(user, run_id, jobs)
+        if not status:
+            raise HTTPException(status_code=500, detail=result)
+        return {
+            "status" : "Processing",
+            "run_id" : run_id,
+            "total" : result["enqueued"],
+            "prompt_version" : prompt_version,
+            "message" : f"Queued {result['enqueued']} proposals ({result['coalesced']} already queued), {concurrency} at a time. Poll /proposals/generate_bulk/{run_id} for progress."
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/generate_bulk/{run_id}")
+async def generate_bulk_progress_api(run_id: int, user = Depends(require_auth)):
+    status, run = await get_generation_run(run_id)
+    if not status:
+        raise HTTPException(status_code=404, detail=run)
+    return {"status" : "Done", "value" : run}
+
+@router.get("/cache/stats")
+async def proposal_cache_stats_api(user = Depends(require_auth)):
+    status, stats = await get_proposal_cache_stats()
+    if not status:
+        raise HTTPException(status_code=500, detail=stats)
+    return {"status" : "Done", "value" : stats}
+
+@router.get("/cache/llm_stats")
+async def llm_cache_stats_api(user = Depends(require_auth)):
+    status, stats = await get_llm_cache_stats()
+    if not status:
+        raise HTTPException(status_code=500, detail=stats)
+    return {"status" : "Done", "value" : stats}
+
+@router.get("/prompt_cache_stats")
+async def prompt_cache_stats_api(since_days: Optional[int] = Query(None, ge=1), user = Depends(require_auth)):
+    status, stats = await get_prompt_cache_stats(since_days)
+    if not status:
+        raise HTTPException(status_code=500, detail=stats)
+    return {"status" : "Done", "value" : stats}
+
+@router.post("/cache/evict")
+async def evict_proposal_cache_api(max_age_seconds: int = Query(PROPOSAL_CACHE_MAX_AGE, ge=0), user = Depends(require_auth)):
+    status, evicted = await evict_cached_proposals(max_age_seconds)
+    if not status:
+        raise HTTPException(status_code=500, detail=evicted)
+    return {"status" : "Done", "evicted" : evicted}
+
 @router.get("/get_proposal")
 async def get_proposal_api(job_url: str, user = Depends(require_auth)):
     try:
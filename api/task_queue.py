@@ -1,12 +1,291 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from pydantic import BaseModel, Field
+from typing import Optional
+import asyncio
+import hmac
+import json
+import os
 from db.pool import get_pool
-from db.queue_manager import enqueue_task
-from security_utils.auth_utils import require_auth
+from db.queue_manager import enqueue_task, enqueue_tasks, cancel_tasks, list_dead_letter_tasks, replay_dead_letter_tasks, get_tasks, get_in_flight_counts, get_user_wait_stats, set_user_share, list_user_shares, TASK_FINAL_STATUSES
+from db.queue_metrics import get_queue_metrics, format_prometheus
+from db.recurring_tasks import add_recurring_task, list_recurring_tasks, set_recurring_task_enabled, delete_recurring_task
+from security_utils.auth_utils import require_auth, require_admin
+from state import get_app_state, AppState
+from worker.supervisor import parse_concurrency_limits
+from upwork_agent.bulk_generation import release_abandoned_generations
 
 router = APIRouter(prefix="/tasks", tags=["tasks"])
 
+MAX_BATCH_SIZE = 1000
+SSE_KEEPALIVE_SECONDS = 15
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")  # bearer token for Prometheus scrapes, which cannot log in
+
+def parse_task_ids(task_ids: Optional[str]) -> Optional[list[int]]:
+    if not task_ids:
+        return None
+    try:
+        return [int(task_id) for task_id in task_ids.split(",") if task_id.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="task_ids must be a comma separated list of integers")
+
+def sse_message(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+class TaskSpec(BaseModel):
+    task_type: str
+    payload: Optional[dict] = None
+    priority: int = 0
+    max_attempts: Optional[int] = Field(None, ge=1)  # None: the task type's default
+    delay_seconds: float = Field(0, ge=0)
+    idempotency_key: Optional[str] = None
+    coalesce: bool = True
+
+class EnqueueBatchRequest(BaseModel):
+    tasks: list[TaskSpec] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+class ReplayDeadLetterRequest(BaseModel):
+    ids: Optional[list[int]] = None
+    task_type: Optional[str] = None
+    replay_all: bool = False
+
+class RecurringTaskRequest(BaseModel):
+    name: str
+    cron: str
+    task_type: str
+    payload: Optional[dict] = None
+    priority: int = 0
+    max_attempts: Optional[int] = Field(None, ge=1)
+    enabled: bool = True
+
+class CancelTasksRequest(BaseModel):
+    task_ids: list[int] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+    reason: Optional[str] = None
+
+class UserShareRequest(BaseModel):
+    username: str
+    weight: float = Field(..., gt=0)
+
 @router.get("/enqueue_task")
-async def enqueue_task_api(task_type:str, user = Depends(require_auth), payload = None, priority:int=0):
+async def enqueue_task_api(
+    task_type:str,
+    user = Depends(require_auth),
+    payload = None,
+    priority:int=0,
+    max_attempts: Optional[int] = Query(None, ge=1),
+    delay_seconds:int = Query(0, ge=0),
+    idempotency_key: Optional[str] = Query(None),
+    coalesce: bool = Query(True),
+):
     print(f"Enqueuing task: {task_type} for user: {user} with payload: {payload} and priority: {priority}")
-    status, message = await enqueue_task(task_type=task_type, username=user, payload=payload, priority=priority)
-    return {"status" : status, "message" : message}
\ No newline at end of file
+    status, result = await enqueue_task(
+        task_type=task_type,
+        username=user,
+        payload=payload,
+        priority=priority,
+        max_attempts=max_attempts,
+        delay_seconds=delay_seconds,
+        idempotency_key=idempotency_key,
+        coalesce=coalesce,
+    )
+    if not status:
+        return {"status" : status, "message" : result}
+    return {
+        "status" : status,
+        "message" : result["message"],
+        "task_id" : result["task_id"],
+        "coalesced" : result["coalesced"],
+    }
+
+@router.post("/enqueue_batch")
+async def enqueue_batch_api(request: EnqueueBatchRequest, user = Depends(require_auth)):
+    specs = []
+    for task in request.tasks:
+        spec = task.model_dump()
+        spec["payload"] = json.dumps(task.payload) if task.payload is not None else None
+        specs.append(spec)
+    status, results = await enqueue_tasks(username=user, specs=specs)
+    if not status:
+        raise HTTPException(status_code=500, detail=results)
+    coalesced = sum(1 for r in results if r["coalesced"])
+    return {
+        "status" : "Done",
+        "enqueued" : len(results) - coalesced,
+        "coalesced" : coalesced,
+        "tasks" : results,
+    }
+
+@router.post("/cancel")
+async def cancel_tasks_api(payload: CancelTasksRequest, user = Depends(require_auth)):
+    # Pending tasks are cancelled now; running ones stop at their next cancellation check
+    status, result = await cancel_tasks(payload.task_ids, username=user, reason=payload.reason or f"Cancelled by {user}")
+    if not status:
+        raise HTTPException(status_code=500, detail=result)
+    await release_abandoned_generations(result.pop("abandoned"))
+    return {"status" : "Done", **result}
+
+@router.get("/workers")
+async def worker_stats_api(user = Depends(require_auth)):
+    # Workers run in their own process, so in-flight counts come from task_queue
+    status, result = await get_in_flight_counts()
+    if not status:
+        raise HTTPException(status_code=500, detail=result)
+    return {"status" : "Done", "value" : {**result, "limits" : parse_concurrency_limits(os.getenv("TASK_CONCURRENCY"))}}
+
+@router.get("/metrics")
+async def queue_metrics_api(user = Depends(require_auth)):
+    status, result = await get_queue_metrics()
+    if not status:
+        raise HTTPException(status_code=500, detail=result)
+    return {"status" : "Done", "value" : result}
+
+@router.get("/metrics/prometheus", response_class=PlainTextResponse)
+async def queue_metrics_prometheus_api(request: Request):
+    # A scraper authenticates with METRICS_TOKEN; without one configured the endpoint needs a login like the rest
+    if METRICS_TOKEN:
+        if not hmac.compare_digest(request.headers.get("authorization", ""), f"Bearer {METRICS_TOKEN}"):
+            raise HTTPException(status_code=401)
+    else:
+        await require_auth(request.cookies.get("access_token"))
+    status, result = await get_queue_metrics()
+    if not status:
+        raise HTTPException(status_code=500, detail=result)
+    return PlainTextResponse(format_prometheus(result), media_type="text/plain; version=0.0.4")
+
+@router.get("/wait_stats")
+async def wait_stats_api(user = Depends(require_auth), window_seconds: int = Query(3600, ge=60, le=7 * 24 * 3600)):
+    status, result = await get_user_wait_stats(window_seconds)
+    if not status:
+        raise HTTPException(status_code=500, detail=result)
+    return {"status" : "Done", "value" : result}
+
+@router.get("/shares")
+async def list_shares_api(user = Depends(require_auth)):
+    status, result = await list_user_shares()
+    if not status:
+        raise HTTPException(status_code=500, detail=result)
+    return {"status" : "Done", "value" : result}
+
+@router.post("/shares")
+async def set_share_api(payload: UserShareRequest, user = Depends(require_admin)):
+    # Only admins (ADMIN_USERS) may change weights, or anyone could raise their own share
+    status, message = await set_user_share(payload.username, payload.weight)
+    if not status:
+        raise HTTPException(status_code=500, detail=message)
+    return {"status" : "Done", "message" : message}
+
+@router.get("/dead_letter")
+async def list_dead_letter_api(
+    user = Depends(require_auth),
+    page: int = Query(1, ge=1),
+    limit: int = Query(50, ge=1, le=500),
+    task_type: Optional[str] = Query(None),
+):
+    status, result = await list_dead_letter_tasks(username=user, limit=limit, offset=(page - 1) * limit, task_type=task_type)
+    if not status:
+        raise HTTPException(status_code=500, detail=result)
+    return {"status" : "Done", "page": page, "limit": limit, **result}
+
+@router.post("/dead_letter/replay")
+async def replay_dead_letter_api(payload: ReplayDeadLetterRequest, user = Depends(require_auth)):
+    if not payload.ids and not payload.task_type and not payload.replay_all:
+        raise HTTPException(status_code=400, detail="Pass ids, a task_type, or replay_all=true")
+    status, result = await replay_dead_letter_tasks(username=user, ids=payload.ids or None, task_type=payload.task_type)
+    if not status:
+        raise HTTPException(status_code=500, detail=result)
+    return {"status" : "Done", **result}
+
+@router.get("/recurring")
+async def list_recurring_api(user = Depends(require_auth)):
+    status, result = await list_recurring_tasks()
+    if not status:
+        raise HTTPException(status_code=500, detail=result)
+    return {"status" : "Done", "value" : result}
+
+@router.post("/recurring")
+async def save_recurring_api(payload: RecurringTaskRequest, user = Depends(require_auth)):
+    status, result = await add_recurring_task(
+        name=payload.name,
+        cron=payload.cron,
+        task_type=payload.task_type,
+        username=user,
+        payload=payload.payload,
+        priority=payload.priority,
+        max_attempts=payload.max_attempts,
+        enabled=payload.enabled,
+    )
+    if not status:
+        raise HTTPException(status_code=400, detail=result["message"])
+    return result
+
+@router.post("/recurring/{name}/enabled")
+async def set_recurring_enabled_api(name:str, enabled:bool, user = Depends(require_auth)):
+    status, message = await set_recurring_task_enabled(name, enabled, username=user)
+    if not status:
+        raise HTTPException(status_code=404, detail=message)
+    return {"status" : "Done", "message" : message}
+
+@router.delete("/recurring/{name}")
+async def delete_recurring_api(name:str, user = Depends(require_auth)):
+    status, message = await delete_recurring_task(name, username=user)
+    if not status:
+        raise HTTPException(status_code=404, detail=message)
+    return {"status" : "Done", "message" : message}
+
+@router.get("/status")
+async def task_status_api(task_ids: Optional[str] = Query(None), user = Depends(require_auth)):
+    ids = parse_task_ids(task_ids)
+    # Scoped to the caller, ids or not, so task payloads and results stay private
+    status, tasks = await get_tasks(task_ids=ids, username=user)
+    if not status:
+        raise HTTPException(status_code=500, detail=tasks)
+    return {"status" : "Done", "tasks" : tasks}
+
+@router.get("/events")
+async def task_events_api(
+    request: Request,
+    task_ids: Optional[str] = Query(None),
+    user = Depends(require_auth),
+    state:AppState = Depends(get_app_state),
+):
+    """
+    Server-Sent Events stream of status transitions for the current user's
+    `task_ids`, or for every task of the current user when no ids are given. Starts with a snapshot of the
+    current state; final transitions carry the task's result or error.
+    """
+    ids = parse_task_ids(task_ids)
+    watched = set(ids) if ids else None
+
+    def wanted(event: dict) -> bool:
+        if event.get("username") != user:
+            return False
+        return watched is None or event.get("id") in watched
+
+    async def stream():
+        queue = await state.task_events.subscribe()
+        try:
+            status, tasks = await get_tasks(task_ids=ids, username=user, live_only=not ids)
+            for task in tasks if status else []:
+                yield sse_message("snapshot", task)
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    await state.task_events.ensure_connected()
+                    continue
+                if not wanted(event):
+                    continue
+                if event.get("status") in TASK_FINAL_STATUSES:
+                    status, tasks = await get_tasks(task_ids=[event["id"]], username=user)
+                    if status and tasks:
+                        event = {**event, "result": tasks[0]["result"], "error": tasks[0]["error"]}
+                yield sse_message("task", event)
+        finally:
+            state.task_events.unsubscribe(queue)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
\ No newline at end of file
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from security_utils.auth_utils import require_auth
+from db.llm_usage import get_cost_per_day, get_cost_per_proposal, get_node_latency
+
+router = APIRouter(prefix="/usage", tags=["usage"])
+
+@router.get("/cost_per_day")
+async def cost_per_day_api(days: int = Query(30, ge=1, le=366), user = Depends(require_auth)):
+    status, value = await get_cost_per_day(days)
+    if not status:
+        raise HTTPException(status_code=500, detail=value)
+    return {"status" : "Done", "value" : value}
+
+@router.get("/cost_per_proposal")
+async def cost_per_proposal_api(days: int = Query(30, ge=1, le=366), limit: int = Query(100, ge=1, le=1000), user = Depends(require_auth)):
+    status, value = await get_cost_per_proposal(days, limit)
+    if not status:
+        raise HTTPException(status_code=500, detail=value)
+    return {"status" : "Done", "value" : value}
+
+@router.get("/node_latency")
+async def node_latency_api(days: int = Query(7, ge=1, le=366), user = Depends(require_auth)):
+    status, value = await get_node_latency(days)
+    if not status:
+        raise HTTPException(status_code=500, detail=value)
+    return {"status" : "Done", "value" : value}
@@ -0,0 +1,84 @@
+import json
+
+from db.pool import get_pool
+
+async def create_generation_run(username:str, filters:dict, prompt_version:int, concurrency:int, total:int):
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            run_id = await conn.fetchval(
+                """
+                INSERT INTO proposal_generation_runs (username, filters, prompt_version, concurrency, total)
+                VALUES ($1, $2, $3, $4, $5)
+                RETURNING id
+                """,
+                username, json.dumps(filters, default=str), prompt_version, concurrency, total
+            )
+        return True, run_id
+    except Exception as e:
+        return False, f"Could not create generation run - {e}"
+
+async def record_generation_result(run_id:int, succeeded:bool):
+    """Count one finished job towards the run; the run is closed when the last one reports."""
+    column = "succeeded" if succeeded else "failed"
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            await conn.execute(
+                f"""
+                UPDATE proposal_generation_runs
+                SET {column} = {column} + 1,
+                    status = CASE WHEN succeeded + failed + 1 >= total THEN 'done' ELSE status END,
+                    finished_at = CASE WHEN succeeded + failed + 1 >= total THEN NOW() ELSE finished_at END
+                WHERE id = $1
+                """,
+                run_id
+            )
+        return True, "Recorded"
+    except Exception as e:
+        return False, f"Could not record generation result - {e}"
+
+async def exclude_from_generation_run(run_id:int, count:int):
+    """Drop jobs that will not report to this run (e.g. already queued by someone else)."""
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            await conn.execute(
+                """
+                UPDATE proposal_generation_runs
+                SET total = total - $2,
+                    status = CASE WHEN succeeded + failed >= total - $2 THEN 'done' ELSE status END,
+                    finished_at = CASE WHEN succeeded + failed >= total - $2 THEN NOW() ELSE finished_at END
+                WHERE id = $1
+                """,
+                run_id, count
+            )
+        return True, "Updated"
+    except Exception as e:
+        return False, f"Could not update generation run - {e}"
+
+async def finish_generation_run(run_id:int, status:str = "done"):
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            await conn.execute(
+                "UPDATE proposal_generation_runs SET status = $2, finished_at = NOW() WHERE id = $1",
+                run_id, status
+            )
+        return True, "Finished"
+    except Exception as e:
+        return False, f"Could not finish generation run - {e}"
+
+async def get_generation_run(run_id:int):
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            row = await conn.fetchrow("SELECT * FROM proposal_generation_runs WHERE id = $1", run_id)
+        if not row:
+            return False, f"Generation run {run_id} not found"
+        run = dict(row)
+        run["filters"] = json.loads(run["filters"]) if run["filters"] else None
+        run["remaining"] = run["total"] - run["succeeded"] - run["failed"]
+        return True, run
+    except Exception as e:
+        return False, f"Could not get generation run - {e}"
@@ -117,4 +117,97 @@ async def change_proposal_generation_status(job_url: str, value: str):
             )
         return True, "Job marked as proposal generated"
     except Exception as e:
-        return False, f"Could not update job - {e}"
\ No newline at end of file
+        return False, f"Could not update job - {e}"
+async def select_jobs_for_generation(statuses:list[str] | None = None, created_from = None, created_to = None, job_urls:list[str] | None = None, stale_prompt_version:int | None = None, limit:int = 500):
+    """
+    Jobs matching a bulk generation filter, oldest first. Jobs being generated
+    or already applied to are never selected. With `stale_prompt_version`, only
+    jobs without a proposal made with that prompt version are returned.
+    """
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT j.job_url, j.proposal_generation_status
+                FROM jobs j
+                LEFT JOIN proposals p ON p.job_url = j.job_url
+                WHERE j.proposal_generation_status NOT IN ('processing', 'applied')
+                  AND ($1::text[] IS NULL OR j.proposal_generation_status = ANY($1::text[]))
+                  AND ($2::timestamptz IS NULL OR j.created_at >= $2)
+                  AND ($3::timestamptz IS NULL OR j.created_at < $3)
+                  AND ($4::text[] IS NULL OR j.job_url = ANY($4::text[]))
+                  AND ($5::int IS NULL OR p.prompt_version IS DISTINCT FROM $5)
+                ORDER BY j.created_at
+                LIMIT $6
+                """,
+                statuses, created_from, created_to, job_urls, stale_prompt_version, limit
+            )
+        return True, [dict(r) for r in rows]
+    except Exception as e:
+        return False, f"Could not select jobs - {e}"
+
+async def mark_jobs_processing(job_urls: list[str]):
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            await conn.execute(
+                "UPDATE jobs SET proposal_generation_status = 'processing' WHERE job_url = ANY($1::text[])",
+                job_urls
+            )
+        return True, f"Marked {len(job_urls)} jobs as processing"
+    except Exception as e:
+        return False, f"Could not update jobs - {e}"
+
+async def mark_job_processing(job_url: str):
+    """
+    Mark one job as processing. Returns (True, {"found": bool, "previous_status": ...})
+    so a failed generation can put it back; previous_status is None if the job
+    does not exist or was already processing.
+    """
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            row = await conn.fetchrow(
+                """
+                UPDATE jobs j
+                SET proposal_generation_status = 'processing'
+                FROM (SELECT job_url, proposal_generation_status FROM jobs WHERE job_url = $1 FOR UPDATE) prev
+                WHERE j.job_url = prev.job_url
+                RETURNING prev.proposal_generation_status
+                """,
+                job_url
+            )
+        if row is None:
+            return True, {"found": False, "previous_status": None}
+        previous = row["proposal_generation_status"]
+        return True, {"found": True, "previous_status": previous if previous != "processing" else None}
+    except Exception as e:
+        return False, f"Could not update job - {e}"
+
+async def reset_failed_generation(job_url: str, previous_status: str | None = None):
+    """
+    After a generation gave up, put a job still in 'processing' back to
+    `previous_status` (e.g. a reviewer's 'draft'), or when that is unknown to
+    the status its stored proposal implies ('draft' for a near-duplicate cache
+    hit, else 'generated'), or 'pending' if it has none.
+    """
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            await conn.execute(
+                """
+                UPDATE jobs j
+                SET proposal_generation_status = COALESCE(
+                    $2,
+                    (SELECT CASE WHEN p.source = 'cache_semantic' THEN 'draft' ELSE 'generated' END
+                     FROM proposals p WHERE p.job_url = j.job_url),
+                    'pending'
+                )
+                WHERE j.job_url = $1 AND j.proposal_generation_status = 'processing'
+                """,
+                job_url, previous_status
+            )
+        return True, "Job status reset"
+    except Exception as e:
+        return False, f"Could not reset job - {e}"
@@ -0,0 +1,74 @@
+import json
+import os
+
+from db.pool import get_pool
+
+LLM_CACHE_MAX_ROWS = int(os.getenv("LLM_CACHE_MAX_ROWS", "20000"))  # per kind
+
+async def get_llm_cache(kind:str, content_hash:str):
+    """Returns (True, value) on a hit and refreshes its last use, (False, None) otherwise."""
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            value = await conn.fetchval(
+                """
+                UPDATE llm_cache SET last_used_at = NOW()
+                WHERE kind = $1 AND content_hash = $2
+                RETURNING value
+                """,
+                kind, content_hash
+            )
+        return (True, json.loads(value)) if value is not None else (False, None)
+    except Exception as e:
+        print(f"LLM cache lookup failed - {e}")
+        return False, None
+
+async def set_llm_cache(kind:str, content_hash:str, value):
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            await conn.execute(
+                """
+                INSERT INTO llm_cache (kind, content_hash, value)
+                VALUES ($1, $2, $3)
+                ON CONFLICT (kind, content_hash) DO UPDATE
+                SET value = EXCLUDED.value, last_used_at = NOW()
+                """,
+                kind, content_hash, json.dumps(value)
+            )
+        return True, "Cached"
+    except Exception as e:
+        return False, f"Could not write LLM cache - {e}"
+
+async def trim_llm_cache(max_rows:int = LLM_CACHE_MAX_ROWS):
+    """Keep only the `max_rows` most recently used entries of each kind."""
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            result = await conn.execute(
+                """
+                DELETE FROM llm_cache c
+                USING (
+                    SELECT kind, content_hash,
+                           ROW_NUMBER() OVER (PARTITION BY kind ORDER BY last_used_at DESC) AS recency
+                    FROM llm_cache
+                ) ranked
+                WHERE c.kind = ranked.kind AND c.content_hash = ranked.content_hash
+                  AND ranked.recency > $1
+                """,
+                max_rows
+            )
+        return True, int(result.split()[-1])
+    except Exception as e:
+        return False, f"Could not trim LLM cache - {e}"
+
+async def get_llm_cache_stats():
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(
+                "SELECT kind, COUNT(*) AS entries, MIN(last_used_at) AS least_recently_used FROM llm_cache GROUP BY kind"
+            )
+        return True, {r["kind"]: {"entries": r["entries"], "least_recently_used": r["least_recently_used"]} for r in rows}
+    except Exception as e:
+        return False, f"Could not get LLM cache stats - {e}"
@@ -0,0 +1,164 @@
+import os
+
+from db.pool import get_pool
+
+LLM_USAGE_BATCH_SIZE = int(os.getenv("LLM_USAGE_BATCH_SIZE", "200"))
+LLM_USAGE_MAX_BUFFERED = 10000  # rows kept while the database is unreachable; the oldest are dropped beyond this
+
+LLM_USAGE_COLUMNS = (
+    "job_url", "prompt_version", "task_id", "node", "model", "calls", "retries",
+    "input_tokens", "cached_input_tokens", "output_tokens", "latency_ms", "cost_usd",
+)
+
+# Rows waiting for the next flush, shared by every generation in the process
+pending_usage: list[dict] = []
+
+def queue_llm_usage(rows:list[dict]):
+    pending_usage.extend(rows)
+    if len(pending_usage) > LLM_USAGE_MAX_BUFFERED:
+        del pending_usage[:len(pending_usage) - LLM_USAGE_MAX_BUFFERED]
+
+async def flush_llm_usage(batch_size:int = LLM_USAGE_BATCH_SIZE):
+    """Write buffered usage rows in batches. Returns (True, rows_written) or (False, error_message)."""
+    written = 0
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            while pending_usage:
+                batch = pending_usage[:batch_size]
+                await conn.executemany(
+                    f"""
+                    INSERT INTO llm_usage ({", ".join(LLM_USAGE_COLUMNS)})
+                    VALUES ({", ".join(f"${i}" for i in range(1, len(LLM_USAGE_COLUMNS) + 1))})
+                    """,
+                    [tuple(row.get(column) for column in LLM_USAGE_COLUMNS) for row in batch]
+                )
+                # Only drop what was written; rows queued meanwhile stay
+                del pending_usage[:len(batch)]
+                written += len(batch)
+        return True, written
+    except Exception as e:
+        return False, f"Could not write LLM usage ({len(pending_usage)} rows buffered) - {e}"
+
+async def get_cost_per_day(days:int = 30):
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT date_trunc('day', created_at)::date AS day,
+                       SUM(cost_usd)::float8 AS cost_usd,
+                       COUNT(DISTINCT job_url) AS proposals,
+                       SUM(input_tokens) AS input_tokens,
+                       SUM(cached_input_tokens) AS cached_input_tokens,
+                       SUM(output_tokens) AS output_tokens
+                FROM llm_usage
+                WHERE created_at > NOW() - make_interval(days => $1)
+                GROUP BY 1
+                ORDER BY 1 DESC
+                """,
+                days
+            )
+        return True, [dict(r) for r in rows]
+    except Exception as e:
+        return False, f"Could not get cost per day - {e}"
+
+async def get_cost_per_proposal(days:int = 30, limit:int = 100):
+    """Cost of each generation (one task, or one job_url when generated outside the queue), newest first."""
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            summary = await conn.fetchrow(
+                """
+                WITH generations AS (
+                    SELECT SUM(cost_usd) AS cost_usd
+                    FROM llm_usage
+                    WHERE created_at > NOW() - make_interval(days => $1)
+                    GROUP BY job_url, COALESCE(task_id, 0)
+                )
+                SELECT COUNT(*) AS generations,
+                       AVG(cost_usd)::float8 AS avg_cost_usd,
+                       percentile_cont(0.95) WITHIN GROUP (ORDER BY cost_usd) AS p95_cost_usd
+                FROM generations
+                """,
+                days
+            )
+            rows = await conn.fetch(
+                """
+                SELECT job_url, task_id, MAX(prompt_version) AS prompt_version,
+                       SUM(cost_usd)::float8 AS cost_usd,
+                       SUM(input_tokens) AS input_tokens,
+                       SUM(cached_input_tokens) AS cached_input_tokens,
+                       SUM(output_tokens) AS output_tokens,
+                       SUM(retries) AS retries,
+                       MAX(created_at) AS created_at
+                FROM llm_usage
+                WHERE created_at > NOW() - make_interval(days => $1)
+                GROUP BY job_url, task_id
+                ORDER BY MAX(created_at) DESC
+                LIMIT $2
+                """,
+                days, limit
+            )
+        return True, {"summary": dict(summary), "proposals": [dict(r) for r in rows]}
+    except Exception as e:
+        return False, f"Could not get cost per proposal - {e}"
+
+async def get_node_latency(days:int = 7):
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT node,
+                       COUNT(*) AS runs,
+                       percentile_cont(0.5) WITHIN GROUP (ORDER BY latency_ms) AS p50_ms,
+                       percentile_cont(0.95) WITHIN GROUP (ORDER BY latency_ms) AS p95_ms,
+                       MAX(latency_ms) AS max_ms,
+                       SUM(retries) AS retries
+                FROM llm_usage
+                WHERE created_at > NOW() - make_interval(days => $1) AND latency_ms IS NOT NULL
+                GROUP BY node
+                ORDER BY p95_ms DESC
+                """,
+                days
+            )
+        return True, [dict(r) for r in rows]
+    except Exception as e:
+        return False, f"Could not get node latency - {e}"
+
+async def get_prompt_cache_stats(since_days:int | None = None):
+    """
+    Prompt-cache hit rate of the proposal LLM call per prompt version, from the
+    ledger: every generation keeps its row, regenerations included, so versions
+    stay comparable after proposals are overwritten.
+    """
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT prompt_version,
+                       COUNT(*) AS generations,
+                       SUM(calls) AS calls,
+                       COUNT(*) FILTER (WHERE cached_input_tokens > 0) AS generations_with_cache_hit,
+                       SUM(input_tokens) AS input_tokens,
+                       SUM(cached_input_tokens) AS cached_input_tokens,
+                       SUM(output_tokens) AS output_tokens
+                FROM llm_usage
+                WHERE node = 'generate_proposal' AND input_tokens > 0
+                  AND ($1::int IS NULL OR created_at > NOW() - make_interval(days => $1))
+                GROUP BY prompt_version
+                ORDER BY prompt_version DESC NULLS LAST
+                """,
+                since_days
+            )
+        stats = []
+        for r in rows:
+            row = dict(r)
+            row["cached_token_ratio"] = round(row["cached_input_tokens"] / row["input_tokens"], 4) if row["input_tokens"] else None
+            row["hit_rate"] = round(row["generations_with_cache_hit"] / row["generations"], 4) if row["generations"] else None
+            stats.append(row)
+        return True, stats
+    except Exception as e:
+        return False, f"Could not get prompt cache stats - {e}"
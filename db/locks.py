@@ -0,0 +1,28 @@
+from contextlib import asynccontextmanager
+
+from db.pool import create_connection
+
+@asynccontextmanager
+async def advisory_lock(key: str):
+    """
+    Hold a session-level Postgres advisory lock on `key` (hashed to a bigint)
+    for the duration of the block, across every process sharing the database.
+    Yields True if another session held the lock and we had to wait for it.
+    The lock lives on its own connection, outside the pool: the block may run
+    for minutes and needs pool connections itself, so holding (or waiting on)
+    one here could starve it. Closing the connection releases the lock.
+    """
+    conn = await create_connection()
+    try:
+        acquired = await conn.fetchval("SELECT pg_try_advisory_lock(hashtextextended($1, 0))", key)
+        if not acquired:
+            await conn.execute("SELECT pg_advisory_lock(hashtextextended($1, 0))", key)
+        try:
+            yield not acquired
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock(hashtextextended($1, 0))", key)
+    finally:
+        try:
+            await conn.close(timeout=5)
+        except Exception:
+            conn.terminate()
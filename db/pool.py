@@ -16,6 +16,12 @@ DB_CONNECTION_STRING = (
     f"{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
 )
 
+# psycopg 3 URL for SQLAlchemy's async engine (used by the async PGVector store)
+ASYNC_DB_CONNECTION_STRING = (
+    f"postgresql+psycopg://{POSTGRES_USER}:{POSTGRES_PASSWORD_ENC}@"
+    f"{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
+)
+
 
 pool = None  # global singleton
 
@@ -39,6 +45,15 @@ async def get_pool():
         raise RuntimeError("Connection pool not initialized. Call init_pool() first.")
     return pool
 
+async def create_connection() -> asyncpg.Connection:
+    """Open a standalone connection outside the pool (e.g. for LISTEN)."""
+    return await asyncpg.connect(
+        user=POSTGRES_USER,
+        password=POSTGRES_PASSWORD_RAW,
+        database=POSTGRES_DB,
+        host=POSTGRES_HOST,
+    )
+
 async def close_pool():
     """Gracefully close the pool."""
     global pool
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+
+from db.pool import get_pool
+
+PROPOSAL_CACHE_SIMILARITY = float(os.getenv("PROPOSAL_CACHE_SIMILARITY", "0.95"))  # cosine similarity for a near-duplicate hit
+PROPOSAL_CACHE_MAX_AGE = int(os.getenv("PROPOSAL_CACHE_MAX_AGE", str(30 * 24 * 3600)))  # seconds before an entry is evicted
+PROPOSAL_CACHE_COUNTERS = ("exact_hit", "semantic_hit", "miss")
+
+def _normalize(value):
+    if isinstance(value, str):
+        return " ".join(value.split())
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_normalize(v) for v in value]
+    return value
+
+def _hash(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, separators=(",", ":"), default=str).encode()).hexdigest()
+
+def proposal_cache_key(job_details:dict, prompt_version:int, model:str) -> str:
+    """Exact-tier key: job details with keys sorted and whitespace collapsed, plus prompt version and model."""
+    return _hash({"job": _normalize(job_details), "prompt_version": prompt_version, "model": model})
+
+def questions_hash(job_details:dict) -> str:
+    # A near-duplicate is only reusable if the client asked the same questions
+    return _hash(_normalize(job_details.get("questions") or "N/A"))
+
+def _vector(embedding:list[float]) -> str:
+    return "[" + ",".join(str(x) for x in embedding) + "]"
+
+async def count_cache_event(name:str):
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            await conn.execute(
+                """
+                INSERT INTO proposal_cache_counters (name, count) VALUES ($1, 1)
+                ON CONFLICT (name) DO UPDATE SET count = proposal_cache_counters.count + 1
+                """,
+                name
+            )
+    except Exception as e:
+        print(f"Could not count proposal cache {name} - {e}")
+
+async def get_exact_cached_proposal(input_hash:str):
+    """Returns (True, {"proposal", "job_type"}) on a hit, (False, None) otherwise."""
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            row = await conn.fetchrow(
+                """
+                UPDATE proposal_cache
+                SET hits = hits + 1, last_hit_at = NOW()
+                WHERE input_hash = $1
+                RETURNING proposal, job_type
+                """,
+                input_hash
+            )
+        return (True, dict(row)) if row else (False, None)
+    except Exception as e:
+        print(f"Proposal cache lookup failed - {e}")
+        return False, None
+
+async def get_similar_cached_proposal(embedding:list[float], prompt_version:int, model:str, questions:str, threshold:float = PROPOSAL_CACHE_SIMILARITY):
+    """Nearest cached proposal for the same prompt, model and questions; a hit only at or above `threshold`."""
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            row = await conn.fetchrow(
+                """
+                SELECT id, proposal, job_type, 1 - (embedding <=> $1::vector) AS similarity
+                FROM proposal_cache
+                WHERE prompt_version = $2 AND model = $3 AND questions_hash = $4 AND embedding IS NOT NULL
+                ORDER BY embedding <=> $1::vector
+                LIMIT 1
+                """,
+                _vector(embedding), prompt_version, model, questions
+            )
+            if not row or row["similarity"] < threshold:
+                return False, None
+            await conn.execute(
+                "UPDATE proposal_cache SET hits = hits + 1, last_hit_at = NOW() WHERE id = $1",
+                row["id"]
+            )
+        return True, dict(row)
+    except Exception as e:
+        print(f"Proposal cache similarity lookup failed - {e}")
+        return False, None
+
+async def add_cached_proposal(input_hash:str, prompt_version:int, model:str, questions:str, job_type:str, job_summary:str, embedding:list[float] | None, proposal_json:str):
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            await conn.execute(
+                """
+                INSERT INTO proposal_cache (input_hash, prompt_version, model, questions_hash, job_type, job_summary, embedding, proposal)
+                VALUES ($1, $2, $3, $4, $5, $6, $7::vector, $8)
+                ON CONFLICT (input_hash) DO UPDATE
+                SET proposal = EXCLUDED.proposal, embedding = EXCLUDED.embedding, created_at = NOW()
+                """,
+                input_hash, prompt_version, model, questions, job_type, job_summary,
+                _vector(embedding) if embedding else None, proposal_json
+            )
+        return True, "Cached"
+    except Exception as e:
+        return False, f"Could not cache proposal - {e}"
+
+async def evict_cached_proposals(max_age_seconds:int = PROPOSAL_CACHE_MAX_AGE):
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            result = await conn.execute(
+                "DELETE FROM proposal_cache WHERE created_at < NOW() - make_interval(secs => $1)",
+                max_age_seconds
+            )
+        return True, int(result.split()[-1])
+    except Exception as e:
+        return False, f"Could not evict cached proposals - {e}"
+
+async def get_proposal_cache_stats():
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            counters = await conn.fetch("SELECT name, count FROM proposal_cache_counters")
+            entries = await conn.fetchrow(
+                """
+                SELECT COUNT(*) AS entries, COALESCE(SUM(hits), 0) AS hits, MIN(created_at) AS oldest_entry
+                FROM proposal_cache
+                """
+            )
+        stats = {name: 0 for name in PROPOSAL_CACHE_COUNTERS}
+        stats.update({r["name"]: r["count"] for r in counters})
+        lookups = sum(stats.values())
+        stats["hit_rate"] = (stats["exact_hit"] + stats["semantic_hit"]) / lookups if lookups else None
+        stats.update(dict(entries))
+        stats["similarity_threshold"] = PROPOSAL_CACHE_SIMILARITY
+        stats["max_age_seconds"] = PROPOSAL_CACHE_MAX_AGE
+        return True, stats
+    except Exception as e:
+        return False, f"Could not get proposal cache stats - {e}"
@@ -36,25 +36,29 @@ async def clear_proposals_table():
     finally:
         await pool.close()
         
-async def add_proposal(uuid:int, job_url: str, job_type:str, proposal:Proposal, applied: bool = False, approved_by: str = None):
+async def add_proposal(uuid:int, job_url: str, job_type:str, proposal:Proposal, applied: bool = False, approved_by: str = None, prompt_version: int = None, replace: bool = False):
     """
     Insert a proposal into the proposals table.
     proposal_model: a Pydantic model instance.
+    With replace=True an existing proposal for the job is overwritten (regeneration);
+    its applied / approved_by / profile are kept.
     """
     try:
         pool = await get_pool()
         async with pool.acquire() as conn:
             await conn.execute(
-                """
-                INSERT INTO proposals (job_uuid, job_url, job_type, proposal, applied,approved_by)
-                VALUES ($1, $2, $3, $4, $5, $6)
+                f"""
+                INSERT INTO proposals (job_uuid, job_url, job_type, proposal, applied, approved_by, prompt_version)
+                VALUES ($1, $2, $3, $4, $5, $6, $7)
+                {"ON CONFLICT (job_url) DO UPDATE SET job_type = EXCLUDED.job_type, proposal = EXCLUDED.proposal, prompt_version = EXCLUDED.prompt_version" if replace else ""}
                 """,
                 uuid,
                 job_url,
                 job_type,
                 proposal.model_dump_json(),  # Convert Pydantic model to dict for JSONB
                 applied,
-                approved_by
+                approved_by,
+                prompt_version
             )
         return True, {"status":"Done", "message" : "Proposal added successfully"}
     except asyncpg.UniqueViolationError:
@@ -162,3 +166,65 @@ async def view_proposals_table(num_rows: int = 10):
         for row in rows:
             print(dict(row))
             
+
+async def store_generated_proposal(uuid:int, job_url: str, job_type:str, proposal:Proposal, prompt_version: int = None, replace: bool = False, source: str = "generated", job_status: str = "generated", compaction_stats: dict = None, usage: dict = None, previous_status: str = None):
+    """
+    Insert (or with replace=True overwrite) a generated proposal and set the job's
+    status (default 'generated') in one transaction, so a job never shows as
+    generated without its proposal or the other way round.
+    `source` records where the proposal came from (generated, cache_exact, cache_semantic);
+    `compaction_stats` the input tokens compaction saved and `usage` the token
+    usage (input_tokens, cached_input_tokens, output_tokens) of the call that
+    produced this proposal; per-call history lives in llm_usage.
+    If a proposal already exists and replace is False nothing is stored and the
+    job goes back to `previous_status` (its status before this generation).
+    Returns (True, {"status": "Done" | "Exists", ...}) or (False, {...}).
+    """
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                proposal_id = await conn.fetchval(
+                    f"""
+                    INSERT INTO proposals (job_uuid, job_url, job_type, proposal, applied, prompt_version, source, compaction_stats,
+                                           input_tokens, cached_input_tokens, output_tokens)
+                    VALUES ($1, $2, $3, $4, FALSE, $5, $6, $7, $8, $9, $10)
+                    ON CONFLICT (job_url) DO {"UPDATE SET job_type = EXCLUDED.job_type, proposal = EXCLUDED.proposal, prompt_version = EXCLUDED.prompt_version, source = EXCLUDED.source, compaction_stats = EXCLUDED.compaction_stats, input_tokens = EXCLUDED.input_tokens, cached_input_tokens = EXCLUDED.cached_input_tokens, output_tokens = EXCLUDED.output_tokens" if replace else "NOTHING"}
+                    RETURNING id
+                    """,
+                    uuid,
+                    job_url,
+                    job_type,
+                    proposal.model_dump_json(),
+                    prompt_version,
+                    source,
+                    json.dumps(compaction_stats) if compaction_stats is not None else None,
+                    (usage or {}).get("input_tokens"),
+                    (usage or {}).get("cached_input_tokens"),
+                    (usage or {}).get("output_tokens")
+                )
+                if proposal_id is not None:
+                    await conn.execute(
+                        "UPDATE jobs SET proposal_generation_status = $2 WHERE job_url = $1",
+                        job_url, job_status
+                    )
+                else:
+                    await conn.execute(
+                        """
+                        UPDATE jobs SET proposal_generation_status = COALESCE($2, 'generated')
+                        WHERE job_url = $1 AND proposal_generation_status = 'processing'
+                        """,
+                        job_url, previous_status
+                    )
+        if proposal_id is None:
+            return True, {"status":"Exists", "message":"Proposal already exists"}
+        return True, {"status":"Done", "message" : "Proposal stored successfully"}
+    except Exception as e:
+        return False, {"status" : "Failed", "message" : f"Storing proposal for {job_url} failed - {e}"}
+
+async def get_proposal_prompt_version(job_url: str):
+    """Returns (exists, prompt_version) for the proposal stored for `job_url`."""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow("SELECT prompt_version FROM proposals WHERE job_url = $1", job_url)
+    return (True, row["prompt_version"]) if row else (False, None)
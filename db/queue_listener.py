@@ -0,0 +1,147 @@
+import asyncio
+import asyncpg
+import json
+
+from db.pool import create_connection
+
+LISTEN_HEALTHCHECK_INTERVAL = 60  # seconds between liveness checks of an idle LISTEN connection
+
+class QueueListener:
+    """
+    Holds a dedicated LISTEN connection and turns NOTIFYs on `channel` into an asyncio.Event.
+    The event is also set when the connection drops so the waiter can fall back to polling.
+    Pass an existing `event` to share one wakeup signal with other producers.
+    """
+    def __init__(self, channel: str, event: asyncio.Event | None = None):
+        self.channel = channel
+        self.conn: asyncpg.Connection | None = None
+        self.event = event or asyncio.Event()
+
+    @property
+    def connected(self) -> bool:
+        return self.conn is not None and not self.conn.is_closed()
+
+    async def connect(self):
+        try:
+            self.conn = await create_connection()
+            self.conn.add_termination_listener(self._on_termination)
+            await self.conn.add_listener(self.channel, self._on_notify)
+            # Anything enqueued while we were not listening has to be picked up too.
+            self.event.set()
+            return True, f"Listening on channel '{self.channel}'"
+        except Exception as e:
+            await self.close()
+            return False, f"Could not listen on channel '{self.channel}' - {e}"
+
+    def _on_notify(self, connection, pid, channel, payload):
+        self.event.set()
+
+    def _on_termination(self, connection):
+        self.conn = None
+        self.event.set()
+
+    async def _healthcheck(self):
+        try:
+            await self.conn.execute("SELECT 1")
+        except Exception as e:
+            print(f"LISTEN connection on '{self.channel}' lost - {e}")
+            await self.close()
+            self.event.set()
+
+    async def wait(self, timeout: float | None = None):
+        """
+        Block until a notification arrives, the connection drops or `timeout` elapses.
+        The event is cleared before returning, so notifications received while
+        the caller is busy are not lost - the next wait() returns immediately.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while not self.event.is_set():
+            remaining = LISTEN_HEALTHCHECK_INTERVAL
+            if deadline is not None:
+                remaining = min(remaining, deadline - loop.time())
+                if remaining <= 0:
+                    break
+            try:
+                await asyncio.wait_for(self.event.wait(), remaining)
+            except asyncio.TimeoutError:
+                if deadline is not None and loop.time() >= deadline:
+                    break
+                if self.connected:
+                    await self._healthcheck()
+                else:
+                    break
+        self.event.clear()
+
+    async def close(self):
+        conn, self.conn = self.conn, None
+        if conn and not conn.is_closed():
+            try:
+                await conn.close(timeout=5)
+            except Exception:
+                conn.terminate()
+
+class TaskEventBroadcaster:
+    """
+    Fans task_events NOTIFYs out to any number of in-process subscribers
+    (one asyncio.Queue each) over a single LISTEN connection.
+    The connection is opened on first use and re-opened by ensure_connected().
+    """
+    def __init__(self, channel: str, max_queued: int = 256):
+        self.channel = channel
+        self.max_queued = max_queued
+        self.conn: asyncpg.Connection | None = None
+        self.subscribers: set[asyncio.Queue] = set()
+        self._lock = asyncio.Lock()
+
+    @property
+    def connected(self) -> bool:
+        return self.conn is not None and not self.conn.is_closed()
+
+    async def ensure_connected(self):
+        if self.connected:
+            return True, "Already listening"
+        async with self._lock:
+            if self.connected:
+                return True, "Already listening"
+            try:
+                self.conn = await create_connection()
+                self.conn.add_termination_listener(self._on_termination)
+                await self.conn.add_listener(self.channel, self._on_notify)
+                return True, f"Listening on channel '{self.channel}'"
+            except Exception as e:
+                await self.close()
+                return False, f"Could not listen on channel '{self.channel}' - {e}"
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            return
+        for queue in self.subscribers:
+            # A slow client loses events rather than stalling everyone else
+            if queue.full():
+                continue
+            queue.put_nowait(event)
+
+    def _on_termination(self, connection):
+        self.conn = None
+
+    async def subscribe(self) -> asyncio.Queue:
+        status, msg = await self.ensure_connected()
+        if not status:
+            print(msg)
+        queue = asyncio.Queue(maxsize=self.max_queued)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
+
+    async def close(self):
+        conn, self.conn = self.conn, None
+        if conn and not conn.is_closed():
+            try:
+                await conn.close(timeout=5)
+            except Exception:
+                conn.terminate()
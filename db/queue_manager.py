@@ -1,66 +1,549 @@
 import asyncpg
 import asyncio
 import json
+import random
+import hashlib
+import os
 from asyncpg.utils import _quote_ident
 
 from db.pool import get_pool,close_pool, init_pool
 
-async def create_queue_table():
+TASK_QUEUE_CHANNEL = "task_queue"  # NOTIFY channel fired on every enqueue
+TASK_EVENTS_CHANNEL = "task_events"  # NOTIFY channel fired by triggers on every status transition
+TASK_CANCEL_CHANNEL = "task_cancel"  # NOTIFY channel telling workers to stop a running task
+TASK_FINAL_STATUSES = ("done", "failed", "dead", "cancelled")
+DEFAULT_LEASE_SECONDS = 120  # how long a claim stays valid without a heartbeat
+DEFAULT_MAX_ATTEMPTS = int(os.getenv("TASK_MAX_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = int(os.getenv("TASK_RETRY_BASE_DELAY", "30"))  # seconds before the first retry
+RETRY_MAX_DELAY = int(os.getenv("TASK_RETRY_MAX_DELAY", "1800"))
+# Task types that must not be retried blindly: a failed browser apply may already have
+# submitted the proposal, so running it again from the login page could apply twice.
+TASK_TYPE_MAX_ATTEMPTS = {"apply_for_job": 1}
+
+# "fifo" claims strictly by priority then age; "fair" shares workers across usernames.
+TASK_SCHEDULING_MODE = os.getenv("TASK_SCHEDULING_MODE", "fifo")
+FAIR_SHARE_WINDOW = int(os.getenv("TASK_FAIR_SHARE_WINDOW", "900"))  # seconds of claim history used to rank users
+TASK_AGING_SECONDS = int(os.getenv("TASK_AGING_SECONDS", "300"))  # waiting this long is worth one priority point
+TASK_AGING_MAX_BOOST = int(os.getenv("TASK_AGING_MAX_BOOST", "10"))
+
+# Columns copied from task_queue into task_queue_history by the archiver.
+# Keep in sync with the history table whenever task_queue gains a column.
+TASK_HISTORY_COLUMNS = (
+    "id", "task_type", "username", "payload", "priority", "status",
+    "worker_id", "created_at", "updated_at", "attempts", "max_attempts",
+    "run_at", "error", "idempotency_key", "result", "claimed_at", "cancel_requested", "finished_at",
+)
+
+def task_idempotency_key(task_type:str, username:str, payload=None) -> str:
+    """
+    Default key: task_type, the owner and a hash of the payload with keys sorted
+    and whitespace dropped. The owner is part of it so one user's task is never
+    folded into another's (which they could not see, and which would run as them).
+    """
+    if isinstance(payload, str):
+        try:
+            payload = json.loads(payload)
+        except ValueError:
+            pass
+    normalized = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return f"{task_type}:{username}:{hashlib.sha256(normalized.encode()).hexdigest()[:32]}"
+
+def default_max_attempts(task_type:str) -> int:
+    return TASK_TYPE_MAX_ATTEMPTS.get(task_type, DEFAULT_MAX_ATTEMPTS)
+
+def retry_delay(attempts:int) -> float:
+    """Exponential backoff with jitter: somewhere in [d/2, d] for d = base * 2^(attempts-1)."""
+    delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** max(attempts - 1, 0))
+    return random.uniform(delay / 2, delay)
+
+async def insert_task(conn, task_type:str, username:str, payload=None, priority:int=0, max_attempts:int | None = None, delay_seconds:float = 0, idempotency_key:str | None = None):
+    """
+    Insert a task on an existing connection and NOTIFY the worker.
+    NOTIFY is delivered on commit, so the worker never wakes before the row is visible.
+    If a pending/processing task already holds `idempotency_key`, nothing is inserted
+    and that task's id is returned instead (its priority is raised if needed).
+    max_attempts defaults per task type (see default_max_attempts).
+    Returns (task_id, coalesced).
+    """
+    if max_attempts is None:
+        max_attempts = default_max_attempts(task_type)
+    row = await conn.fetchrow("""
+        WITH upserted AS (
+            INSERT INTO task_queue (task_type, username, payload, priority, max_attempts, run_at, idempotency_key)
+            VALUES ($1, $2, $3, $4, $5, NOW() + make_interval(secs => $6), $8)
+            ON CONFLICT (idempotency_key) WHERE status IN ('pending', 'processing')
+            DO UPDATE SET priority = GREATEST(task_queue.priority, EXCLUDED.priority)
+            RETURNING id, (xmax = 0) AS inserted
+        )
+        SELECT id, inserted, pg_notify($7, id::text) FROM upserted;
+    """, task_type, username, payload, priority, max_attempts, delay_seconds, TASK_QUEUE_CHANNEL, idempotency_key)
+    return row["id"], not row["inserted"]
+
+async def enqueue_task(task_type:str, username:str, payload=None, priority:int=0, max_attempts:int | None = None, delay_seconds:float = 0, idempotency_key:str | None = None, coalesce:bool = True):
+    """
+    Enqueue a task. Unless `coalesce` is False, duplicates of live work are folded
+    into the existing task using `idempotency_key` (derived from task_type,
+    username and payload when not given).
+    Returns (True, {"status": "Enqueued" | "Coalesced", "task_id": id, ...}) or (False, error_message).
+    """
     try:
+        print(f" from db : Enqueueing task: {task_type} for user: {username} with payload: {payload} and priority: {priority}")
+        if coalesce and idempotency_key is None:
+            idempotency_key = task_idempotency_key(task_type, username, payload)
         pool = await get_pool()
         async with pool.acquire() as conn:
-            await conn.execute("""
-            CREATE TABLE IF NOT EXISTS task_queue (
-                id SERIAL PRIMARY KEY,
-                task_type TEXT NOT NULL,
-                payload JSONB,
-                priority INTEGER DEFAULT 0,
-                status TEXT DEFAULT 'pending', -- pending, processing, done, failed, aborted_via_restart
-                created_at TIMESTAMP DEFAULT NOW(),
-                updated_at TIMESTAMP DEFAULT NOW()
-            );
-        """)
-            await conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_task_queue_priority
-                ON task_queue (priority DESC, created_at ASC);
-            """)
-        return True, "Created task_queue table"
+            task_id, coalesced = await insert_task(conn, task_type, username, payload, priority, max_attempts, delay_seconds, idempotency_key if coalesce else None)
+        if coalesced:
+            return True, {"status": "Coalesced", "task_id": task_id, "coalesced": True, "message": f"Task {task_id} is already queued"}
+        return True, {"status": "Enqueued", "task_id": task_id, "coalesced": False, "message": f"Task {task_id} enqueued successfully"}
     except Exception as e:
-        return False, f"Could not create the task_queue table - {e}"
-    
-async def enqueue_task(task_type:str, username:str, payload=None, priority:int=0):
+        return False, f"Could not enqueue task - {e}"
+        
+async def enqueue_tasks(username:str, specs:list[dict]):
+    """
+    Enqueue many tasks in a single INSERT ... SELECT FROM unnest(...).
+    Each spec is a dict with task_type and optional payload, priority, max_attempts,
+    delay_seconds, idempotency_key and coalesce (same meaning as in enqueue_task).
+    Duplicates inside the batch are folded together before hitting the database.
+    Returns (True, [{"index", "task_id", "coalesced"}, ...]) in input order, or (False, error_message).
+    """
     try:
-        print(f" from db : Enqueueing task: {task_type} for user: {username} with payload: {payload} and priority: {priority}")
+        keys = []
+        rows = []
+        queued_keys = {}  # idempotency key -> index of its row
+        for spec in specs:
+            key = spec.get("idempotency_key")
+            if not spec.get("coalesce", True):
+                key = None
+            elif key is None:
+                key = task_idempotency_key(spec["task_type"], username, spec.get("payload"))
+            priority = spec.get("priority", 0)
+            if key is None or key not in queued_keys:
+                rows.append([
+                    spec["task_type"], spec.get("payload"), priority,
+                    spec.get("max_attempts") or default_max_attempts(spec["task_type"]), float(spec.get("delay_seconds", 0)), key,
+                ])
+                queued_keys[key] = len(rows) - 1
+            else:
+                # Same as the GREATEST(...) on conflict: a folded duplicate keeps the higher priority
+                row = rows[queued_keys[key]]
+                row[2] = max(row[2], priority)
+            keys.append(key)
+        if not rows:
+            return True, []
+        columns = list(zip(*rows))
         pool = await get_pool()
         async with pool.acquire() as conn:
-            await conn.execute("""
-                INSERT INTO task_queue (task_type, username, payload, priority)
-                VALUES ($1, $2, $3, $4);
-            """, task_type, username, payload, priority)
-        return True, "Task enqueued successfully"
+            async with conn.transaction():
+                inserted = await conn.fetch(
+                    """
+                    WITH input AS (
+                        SELECT * FROM unnest($1::text[], $2::jsonb[], $3::int[], $4::int[], $5::float8[], $6::text[])
+                        WITH ORDINALITY AS t(task_type, payload, priority, max_attempts, delay_seconds, idempotency_key, ord)
+                    )
+                    INSERT INTO task_queue (task_type, username, payload, priority, max_attempts, run_at, idempotency_key)
+                    SELECT task_type, $7, payload, priority, max_attempts, NOW() + make_interval(secs => delay_seconds), idempotency_key
+                    FROM input
+                    ORDER BY ord
+                    ON CONFLICT (idempotency_key) WHERE status IN ('pending', 'processing')
+                    DO UPDATE SET priority = GREATEST(task_queue.priority, EXCLUDED.priority)
+                    RETURNING id, idempotency_key, (xmax = 0) AS inserted
+                    """,
+                    *columns, username
+                )
+                await conn.execute("SELECT pg_notify($1, 'batch')", TASK_QUEUE_CHANNEL)
+        by_key = {r["idempotency_key"]: r for r in inserted if r["idempotency_key"] is not None}
+        # Rows without a key cannot be matched by key; ids are handed out in insert order.
+        unkeyed_ids = iter(sorted(r["id"] for r in inserted if r["idempotency_key"] is None))
+        results = []
+        seen_keys = set()
+        for index, key in enumerate(keys):
+            if key is None:
+                results.append({"index": index, "task_id": next(unkeyed_ids), "coalesced": False})
+                continue
+            row = by_key[key]
+            results.append({
+                "index": index,
+                "task_id": row["id"],
+                "coalesced": key in seen_keys or not row["inserted"],
+            })
+            seen_keys.add(key)
+        return True, results
     except Exception as e:
-        return False, f"Could not enqueue task - {e}"
-        
-async def get_next_task():
+        return False, f"Could not enqueue tasks - {e}"
+
+CLAIM_TASK_FIFO_SQL = """
+    UPDATE task_queue
+    SET status = 'processing',
+        worker_id = $1,
+        lease_until = NOW() + make_interval(secs => $2),
+        attempts = attempts + 1,
+        claimed_at = NOW(),
+        updated_at = NOW()
+    WHERE id = (
+        SELECT id FROM task_queue
+        WHERE status = 'pending'
+          AND run_at <= NOW()
+          AND ($3::text[] IS NULL OR task_type = ANY($3::text[]))
+        ORDER BY priority DESC, created_at ASC
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING *
+"""
+
+# Each user's best ready task is a candidate. Candidates are ranked by how many
+# claims the user got in the last $4 seconds divided by their share weight, so
+# a user who bulk-enqueues is served in turn with everyone else. Within a user,
+# and as a tie-breaker, priority is aged by one point per $5 seconds of waiting
+# (capped at $6) so low priority work is not starved either.
+CLAIM_TASK_FAIR_SQL = """
+    WITH candidates AS (
+        SELECT DISTINCT ON (COALESCE(username, '')) id, username, created_at,
+               priority + LEAST(EXTRACT(EPOCH FROM NOW() - created_at) / $5, $6) AS effective_priority
+        FROM task_queue
+        WHERE status = 'pending'
+          AND run_at <= NOW()
+          AND ($3::text[] IS NULL OR task_type = ANY($3::text[]))
+        ORDER BY COALESCE(username, ''), effective_priority DESC, created_at ASC
+    ), served AS (
+        SELECT COALESCE(username, '') AS username, COUNT(*) AS claims
+        FROM task_queue
+        WHERE claimed_at > NOW() - make_interval(secs => $4)
+        GROUP BY 1
+    ), ranked AS (
+        SELECT c.id,
+               COALESCE(s.claims, 0) / COALESCE(w.weight, 1) AS share_used,
+               c.effective_priority,
+               c.created_at
+        FROM candidates c
+        LEFT JOIN served s ON s.username = COALESCE(c.username, '')
+        LEFT JOIN task_queue_user_shares w ON w.username = c.username
+    ), picked AS (
+        SELECT t.id
+        FROM task_queue t
+        JOIN ranked r ON r.id = t.id
+        WHERE t.status = 'pending'
+        ORDER BY r.share_used ASC, r.effective_priority DESC, r.created_at ASC
+        LIMIT 1
+        FOR UPDATE OF t SKIP LOCKED
+    )
+    UPDATE task_queue
+    SET status = 'processing',
+        worker_id = $1,
+        lease_until = NOW() + make_interval(secs => $2),
+        attempts = attempts + 1,
+        claimed_at = NOW(),
+        updated_at = NOW()
+    WHERE id = (SELECT id FROM picked)
+    RETURNING *
+"""
+
+async def get_next_task(worker_id:str, task_types:list[str] | None = None, lease_seconds:int = DEFAULT_LEASE_SECONDS, mode:str | None = None):
+    """
+    Atomically claim the next pending task for `worker_id`.
+    The row is locked, marked 'processing' and leased in a single statement,
+    so no other worker can pick it up between the select and the update.
+    `task_types` restricts the claim to types the caller has capacity for.
+    `mode` is "fifo" or "fair" and defaults to TASK_SCHEDULING_MODE.
+    """
+    mode = mode or TASK_SCHEDULING_MODE
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            if mode == "fair":
+                row = await conn.fetchrow(
+                    CLAIM_TASK_FAIR_SQL,
+                    worker_id, lease_seconds, task_types,
+                    FAIR_SHARE_WINDOW, TASK_AGING_SECONDS, TASK_AGING_MAX_BOOST
+                )
+            else:
+                row = await conn.fetchrow(CLAIM_TASK_FIFO_SQL, worker_id, lease_seconds, task_types)
+            if row:
+                return True, dict(row)
+            else:
+                return False, "No pending tasks"
+    except Exception as e:
+        return False, f"Could not get task - {e}"
+
+async def extend_task_lease(task_id:int, worker_id:str, lease_seconds:int = DEFAULT_LEASE_SECONDS):
+    """
+    Heartbeat for a running task. Returns (True, {"held": bool, "cancel_requested": bool});
+    held is False once the lease is no longer held by `worker_id` (e.g. it expired
+    and the reaper requeued the task). (False, error_message) means the heartbeat
+    itself failed and says nothing about the lease.
+    """
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            cancel_requested = await conn.fetchval(
+                """
+                UPDATE task_queue
+                SET lease_until = NOW() + make_interval(secs => $3), updated_at = NOW()
+                WHERE id = $1 AND worker_id = $2 AND status = 'processing'
+                RETURNING cancel_requested
+                """,
+                task_id, worker_id, lease_seconds
+            )
+        if cancel_requested is None:
+            return True, {"held": False, "cancel_requested": False}
+        return True, {"held": True, "cancel_requested": cancel_requested}
+    except Exception as e:
+        return False, f"Could not extend lease - {e}"
+
+async def complete_task(task_id:int, worker_id:str, status:str = "done", result=None):
+    """
+    Release a claimed task with a final status and the handler's JSON-serialisable
+    result, unless the handler already set a status itself.
+    """
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            await conn.execute(
+                """
+                UPDATE task_queue
+                SET status = $3, result = $4, lease_until = NULL, updated_at = NOW()
+                WHERE id = $1 AND worker_id = $2 AND status = 'processing'
+                """,
+                task_id, worker_id, status,
+                json.dumps(result, default=str) if result is not None else None
+            )
+        return True, "Task completed"
+    except Exception as e:
+        return False, f"Could not complete task - {e}"
+
+async def get_next_run_in(task_types:list[str] | None = None):
+    """Seconds until the earliest delayed pending task becomes ready, or None if there is none."""
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            seconds = await conn.fetchval(
+                """
+                SELECT EXTRACT(EPOCH FROM MIN(run_at) - NOW())
+                FROM task_queue
+                WHERE status = 'pending'
+                  AND run_at > NOW()
+                  AND ($1::text[] IS NULL OR task_type = ANY($1::text[]))
+                """,
+                task_types
+            )
+        return None if seconds is None else max(float(seconds), 0.0)
+    except Exception as e:
+        print(f"Could not get next run time - {e}")
+        return None
+
+async def _move_to_dead_letter(conn, task_ids:list[int], error:str | None = None):
+    """Move the given task rows into task_dead_letter. Must run inside a transaction."""
+    return await conn.fetch(
+        """
+        WITH moved AS (
+            DELETE FROM task_queue
+            WHERE id = ANY($1::int[])
+            RETURNING id, task_type, username, payload, priority, attempts, max_attempts, error, created_at
+        )
+        INSERT INTO task_dead_letter (task_id, task_type, username, payload, priority, attempts, max_attempts, last_error, created_at)
+        SELECT id, task_type, username, payload, priority, attempts, max_attempts, COALESCE($2, error), created_at
+        FROM moved
+        RETURNING task_id, task_type, payload
+        """,
+        task_ids, error
+    )
+
+async def fail_task(task_id:int, worker_id:str, error:str | None = None):
+    """
+    Record a failed attempt. The task is rescheduled with jittered exponential
+    backoff while it has attempts left, otherwise it is moved to task_dead_letter.
+    Returns (True, {"status": "Retrying" | "Dead", ...}) or (False, error_message).
+    """
     try:
         pool = await get_pool()
         async with pool.acquire() as conn:
             async with conn.transaction():
                 row = await conn.fetchrow(
                     """
-                    SELECT * FROM task_queue
-                    WHERE status = 'pending'
-                    ORDER BY priority DESC, created_at ASC
-                    LIMIT 1
+                    SELECT attempts, max_attempts FROM task_queue
+                    WHERE id = $1 AND worker_id = $2 AND status = 'processing'
+                    FOR UPDATE
+                    """,
+                    task_id, worker_id
+                )
+                if not row:
+                    return False, f"Task {task_id} is not held by {worker_id}"
+                if row["attempts"] >= row["max_attempts"]:
+                    await _move_to_dead_letter(conn, [task_id], error)
+                    return True, {"status": "Dead", "message": f"Task {task_id} moved to dead letter after {row['attempts']} attempts"}
+                delay = retry_delay(row["attempts"])
+                await conn.execute(
+                    """
+                    UPDATE task_queue
+                    SET status = 'pending', worker_id = NULL, lease_until = NULL, error = $2,
+                        run_at = NOW() + make_interval(secs => $3), updated_at = NOW()
+                    WHERE id = $1
+                    """,
+                    task_id, error, delay
+                )
+                await conn.execute("SELECT pg_notify($1, $2)", TASK_QUEUE_CHANNEL, str(task_id))
+        return True, {"status": "Retrying", "retry_in": round(delay, 1), "message": f"Task {task_id} retrying in {delay:.0f}s"}
+    except Exception as e:
+        return False, f"Could not record task failure - {e}"
+
+async def requeue_expired_tasks():
+    """
+    Put 'processing' tasks whose lease has expired back to 'pending'.
+    Covers workers that crashed or were restarted mid-task; tasks that already
+    used up their attempts go to the dead letter table instead.
+    Returns (True, {"requeued": n, "dead": n, "cancelled": n, "abandoned": [...], "message": ...})
+    or (False, error_message); `abandoned` holds {"id", "task_type", "payload"} of the
+    tasks that reached a final status here, so their side effects can be undone.
+    """
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                # A task that was being cancelled when its worker died is not retried
+                cancelled = await conn.fetch(
+                    """
+                    UPDATE task_queue
+                    SET status = 'cancelled', lease_until = NULL,
+                        error = 'Cancelled (lease expired)', updated_at = NOW()
+                    WHERE status = 'processing' AND lease_until < NOW() AND cancel_requested
+                    RETURNING id, task_type, payload
+                    """
+                )
+                exhausted = await conn.fetch(
+                    """
+                    SELECT id FROM task_queue
+                    WHERE status = 'processing' AND lease_until < NOW() AND attempts >= max_attempts
                     FOR UPDATE SKIP LOCKED
                     """
                 )
-                if row:
-                    return True, dict(row)
-                else:
-                    return False, "No pending tasks"
+                dead = []
+                if exhausted:
+                    dead = await _move_to_dead_letter(conn, [r["id"] for r in exhausted], "Lease expired")
+                rows = await conn.fetch(
+                    """
+                    UPDATE task_queue
+                    SET status = 'pending', worker_id = NULL, lease_until = NULL,
+                        error = 'Lease expired', updated_at = NOW()
+                    WHERE status = 'processing' AND lease_until < NOW()
+                    RETURNING id
+                    """
+                )
+                if rows:
+                    await conn.execute("SELECT pg_notify($1, 'requeued')", TASK_QUEUE_CHANNEL)
+        return True, {
+            "requeued": len(rows),
+            "dead": len(dead),
+            "cancelled": len(cancelled),
+            "abandoned": [dict(r) for r in cancelled] + [
+                {"id": r["task_id"], "task_type": r["task_type"], "payload": r["payload"]} for r in dead
+            ],
+            "message": f"Requeued {len(rows)} tasks with expired leases, {len(dead)} moved to dead letter, {len(cancelled)} cancelled"
+        }
     except Exception as e:
-        return False, f"Could not get task - {e}"
+        return False, f"Could not requeue expired tasks - {e}"
+
+async def cancel_tasks(task_ids:list[int], username:str, reason:str = "Cancelled by user"):
+    """
+    Pending tasks are cancelled right away. Running tasks get cancel_requested
+    and a NOTIFY on TASK_CANCEL_CHANNEL; the worker running them stops at the
+    next cancellation check and marks them cancelled itself.
+    Only `username`'s own tasks are touched; other ids come back as not_cancellable.
+    Returns (True, {"cancelled": [...], "cancelling": [...], "not_cancellable": [...], "abandoned": [...]})
+    where `abandoned` holds {"id", "task_type", "payload"} of the pending tasks cancelled here.
+    """
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                cancelled = await conn.fetch(
+                    """
+                    UPDATE task_queue
+                    SET status = 'cancelled', error = $2, updated_at = NOW()
+                    WHERE id = ANY($1::int[]) AND status = 'pending' AND username = $3
+                    RETURNING id, task_type, payload
+                    """,
+                    task_ids, reason, username
+                )
+                cancelling = await conn.fetch(
+                    """
+                    UPDATE task_queue
+                    SET cancel_requested = TRUE, error = $2, updated_at = NOW()
+                    WHERE id = ANY($1::int[]) AND status = 'processing' AND username = $3
+                    RETURNING id, worker_id
+                    """,
+                    task_ids, reason, username
+                )
+                for row in cancelling:
+                    await conn.execute(
+                        "SELECT pg_notify($1, $2)",
+                        TASK_CANCEL_CHANNEL, json.dumps({"id": row["id"], "worker_id": row["worker_id"]})
+                    )
+        cancelled_ids = [r["id"] for r in cancelled]
+        cancelling_ids = [r["id"] for r in cancelling]
+        handled = set(cancelled_ids) | set(cancelling_ids)
+        return True, {
+            "cancelled": cancelled_ids,
+            "cancelling": cancelling_ids,
+            "not_cancellable": [task_id for task_id in task_ids if task_id not in handled],
+            "abandoned": [dict(r) for r in cancelled],
+        }
+    except Exception as e:
+        return False, f"Could not cancel tasks - {e}"
+
+async def list_dead_letter_tasks(username:str, limit:int = 50, offset:int = 0, task_type:str | None = None):
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT * FROM task_dead_letter
+                WHERE username = $4 AND ($3::text IS NULL OR task_type = $3)
+                ORDER BY failed_at DESC
+                LIMIT $1 OFFSET $2
+                """,
+                limit, offset, task_type, username
+            )
+            total = await conn.fetchval(
+                "SELECT COUNT(*) FROM task_dead_letter WHERE username = $2 AND ($1::text IS NULL OR task_type = $1)",
+                task_type, username
+            )
+        return True, {"total": total, "tasks": [dict(r) for r in rows]}
+    except Exception as e:
+        return False, f"Could not list dead letter tasks - {e}"
+
+async def replay_dead_letter_tasks(username:str, ids:list[int] | None = None, task_type:str | None = None):
+    """
+    Re-enqueue `username`'s dead-lettered tasks as fresh pending tasks (attempts reset).
+    With no ids, every one of their dead-lettered tasks (optionally of `task_type`) is replayed.
+    Replays that duplicate live work are coalesced into it.
+    """
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                rows = await conn.fetch(
+                    """
+                    DELETE FROM task_dead_letter
+                    WHERE username = $3
+                      AND ($1::int[] IS NULL OR id = ANY($1::int[]))
+                      AND ($2::text IS NULL OR task_type = $2)
+                    RETURNING task_type, username, payload, priority, max_attempts
+                    """,
+                    ids, task_type, username
+                )
+                task_ids = []
+                coalesced = 0
+                for row in rows:
+                    task_id, was_coalesced = await insert_task(
+                        conn, row["task_type"], row["username"], row["payload"], row["priority"], row["max_attempts"],
+                        idempotency_key=task_idempotency_key(row["task_type"], row["username"], row["payload"])
+                    )
+                    task_ids.append(task_id)
+                    coalesced += was_coalesced
+        return True, {"replayed": len(rows), "coalesced": coalesced, "task_ids": task_ids}
+    except Exception as e:
+        return False, f"Could not replay dead letter tasks - {e}"
     
 async def view_tasks_table(num_rows: int = 10):
     """
@@ -86,39 +569,198 @@ async def view_queue_table(num_rows: int = 10):
         for row in rows:
             print(dict(row))
             
-async def update_task_status(task_id:int, status:str):
+async def archive_finished_tasks(batch_size:int = 500, retention_seconds:int = 3600):
+    """
+    Move one batch of finished tasks older than `retention_seconds` into
+    task_queue_history, keeping the hot table small.
+    Returns (True, number_of_rows_moved) or (False, error_message).
+    """
+    columns = ", ".join(TASK_HISTORY_COLUMNS)
+    # A task whose id is already in history (e.g. after a restore or a sequence reset) is
+    # overwritten with its latest run rather than lost with the deleted row.
+    updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in TASK_HISTORY_COLUMNS if column != "id")
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            moved = await conn.fetchval(
+                f"""
+                WITH moved AS (
+                    DELETE FROM task_queue
+                    WHERE id IN (
+                        SELECT id FROM task_queue
+                        WHERE status NOT IN ('pending', 'processing')
+                          AND updated_at < NOW() - make_interval(secs => $2)
+                        ORDER BY updated_at
+                        LIMIT $1
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING {columns}
+                ), archived AS (
+                    INSERT INTO task_queue_history ({columns})
+                    SELECT {columns} FROM moved
+                    ON CONFLICT (id) DO UPDATE SET {updates}
+                    RETURNING 1
+                )
+                SELECT COUNT(*) FROM archived
+                """,
+                batch_size, retention_seconds
+            )
+        return True, moved
+    except Exception as e:
+        return False, f"Could not archive finished tasks - {e}"
+
+async def get_tasks(task_ids:list[int] | None = None, username:str | None = None, live_only:bool = False, limit:int = 200):
+    """
+    Current state of tasks by id and/or of `username`'s tasks, looking through
+    task_queue, task_queue_history and task_dead_letter. With both, only ids
+    belonging to `username` are returned.
+    """
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT * FROM (
+                    SELECT id, task_type, username, status, attempts, result, error, created_at, updated_at
+                    FROM task_queue
+                    WHERE ($1::int[] IS NULL OR id = ANY($1::int[]))
+                      AND ($2::text IS NULL OR username = $2)
+                      AND (NOT $3 OR status IN ('pending', 'processing'))
+                    UNION ALL
+                    SELECT id, task_type, username, status, attempts, result, error, created_at, updated_at
+                    FROM task_queue_history
+                    WHERE $1::int[] IS NOT NULL AND id = ANY($1::int[])
+                      AND ($2::text IS NULL OR username = $2)
+                    UNION ALL
+                    SELECT task_id, task_type, username, 'dead', attempts, NULL, last_error, created_at, failed_at
+                    FROM task_dead_letter
+                    WHERE $1::int[] IS NOT NULL AND task_id = ANY($1::int[])
+                      AND ($2::text IS NULL OR username = $2)
+                ) tasks
+                ORDER BY updated_at DESC
+                LIMIT $4
+                """,
+                task_ids, username, live_only, limit
+            )
+        tasks = []
+        for row in rows:
+            task = dict(row)
+            task["result"] = json.loads(task["result"]) if task["result"] else None
+            tasks.append(task)
+        return True, tasks
+    except Exception as e:
+        return False, f"Could not get tasks - {e}"
+
+async def get_in_flight_counts():
+    """Processing tasks per worker and task_type plus pending depth per task_type, read from the partial indexes."""
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            running = await conn.fetch(
+                """
+                SELECT worker_id, task_type, COUNT(*) AS in_flight
+                FROM task_queue
+                WHERE status = 'processing'
+                GROUP BY worker_id, task_type
+                """
+            )
+            pending = await conn.fetch(
+                """
+                SELECT task_type, COUNT(*) AS pending
+                FROM task_queue
+                WHERE status = 'pending'
+                GROUP BY task_type
+                """
+            )
+        workers = {}
+        for row in running:
+            workers.setdefault(row["worker_id"], {})[row["task_type"]] = row["in_flight"]
+        return True, {"workers": workers, "pending": {r["task_type"]: r["pending"] for r in pending}}
+    except Exception as e:
+        return False, f"Could not get in-flight counts - {e}"
+
+async def set_user_share(username:str, weight:float):
+    """Relative share of worker time for `username` in fair scheduling mode (default 1)."""
+    if weight <= 0:
+        return False, "Weight must be positive"
     try:
         pool = await get_pool()
         async with pool.acquire() as conn:
             await conn.execute(
-                "UPDATE task_queue SET status = $1, updated_at = NOW() WHERE id = $2",
-                status, task_id
+                """
+                INSERT INTO task_queue_user_shares (username, weight)
+                VALUES ($1, $2)
+                ON CONFLICT (username) DO UPDATE
+                SET weight = EXCLUDED.weight, updated_at = NOW()
+                """,
+                username, weight
             )
-        return True, "Task status updated successfully"
+        return True, f"Share for '{username}' set to {weight}"
     except Exception as e:
-        return False, f"Could not update task status - {e}"
-    
-async def abort_tasks_on_restart(task_type: str = "check_for_jobs"):
+        return False, f"Could not set share for '{username}' - {e}"
+
+async def list_user_shares():
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch("SELECT username, weight, updated_at FROM task_queue_user_shares ORDER BY username")
+        return True, [dict(r) for r in rows]
+    except Exception as e:
+        return False, f"Could not list user shares - {e}"
+
+async def get_user_wait_stats(window_seconds:int = 3600):
     """
-    Mark pending/processing tasks of the given task_type as 'aborted via restart'.
-    Returns (True, message) or (False, error_message).
+    Per-user queue wait (claimed_at - run_at, in seconds) for tasks claimed in the
+    last `window_seconds`, plus the current pending depth and oldest ready task.
     """
     try:
         pool = await get_pool()
         async with pool.acquire() as conn:
-            result = await conn.execute(
+            waits = await conn.fetch(
                 """
-                UPDATE task_queue
-                SET status = 'aborted_via_restart', updated_at = NOW()
-                WHERE task_type = $1 AND status IN ('pending', 'processing');
+                WITH claimed AS (
+                    SELECT username, EXTRACT(EPOCH FROM claimed_at - run_at) AS wait
+                    FROM task_queue
+                    WHERE claimed_at > NOW() - make_interval(secs => $1)
+                    UNION ALL
+                    SELECT username, EXTRACT(EPOCH FROM claimed_at - run_at)
+                    FROM task_queue_history
+                    WHERE claimed_at > NOW() - make_interval(secs => $1)
+                )
+                SELECT username,
+                       COUNT(*) AS claimed,
+                       AVG(wait) AS avg_wait,
+                       percentile_cont(0.5) WITHIN GROUP (ORDER BY wait) AS p50_wait,
+                       percentile_cont(0.95) WITHIN GROUP (ORDER BY wait) AS p95_wait,
+                       MAX(wait) AS max_wait
+                FROM claimed
+                GROUP BY username
                 """,
-                task_type
+                window_seconds
             )
-            # result is like "UPDATE <n>"
-            try:
-                affected = int(result.split()[-1])
-            except Exception:
-                affected = 0
-        return True, f"Marked {affected} '{task_type}' tasks as aborted via restart"
-    except Exception as e:
-        return False, f"Could not mark tasks as aborted - {e}"
\ No newline at end of file
+            pending = await conn.fetch(
+                """
+                SELECT username,
+                       COUNT(*) AS pending,
+                       EXTRACT(EPOCH FROM NOW() - MIN(run_at)) FILTER (WHERE run_at <= NOW()) AS oldest_ready_age
+                FROM task_queue
+                WHERE status = 'pending'
+                GROUP BY username
+                """
+            )
+        users = {}
+        for row in waits:
+            users[row["username"]] = {
+                "claimed": row["claimed"],
+                "avg_wait": float(row["avg_wait"]),
+                "p50_wait": float(row["p50_wait"]),
+                "p95_wait": float(row["p95_wait"]),
+                "max_wait": float(row["max_wait"]),
+            }
+        for row in pending:
+            user = users.setdefault(row["username"], {"claimed": 0})
+            user["pending"] = row["pending"]
+            user["oldest_ready_age"] = float(row["oldest_ready_age"]) if row["oldest_ready_age"] is not None else None
+        return True, {"mode": TASK_SCHEDULING_MODE, "window_seconds": window_seconds, "users": users}
+    except Exception as e:
+        return False, f"Could not get wait stats - {e}"
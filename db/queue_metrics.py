@@ -0,0 +1,199 @@
+import os
+
+from db.pool import get_pool
+
+# Sliding windows (seconds) the latency percentiles are computed over
+METRICS_WINDOWS = [int(w) for w in os.getenv("TASK_METRICS_WINDOWS", "300,3600").split(",") if w.strip()]
+METRICS_QUANTILES = (0.5, 0.95, 0.99)
+
+def _quantiles(row, prefix:str) -> dict:
+    values = row[prefix] or []
+    summary = {f"p{int(q * 100)}": float(v) for q, v in zip(METRICS_QUANTILES, values) if v is not None}
+    if row[f"{prefix}_avg"] is not None:
+        summary["avg"] = float(row[f"{prefix}_avg"])
+        summary["max"] = float(row[f"{prefix}_max"])
+    return summary
+
+def _empty_window_stats() -> dict:
+    return {"claimed": 0, "done": 0, "failed": 0, "cancelled": 0, "dead": 0, "wait": {}, "run_time": {}}
+
+async def get_queue_depth(conn) -> dict:
+    """Live depth per task_type, read from the pending and processing partial indexes only."""
+    pending = await conn.fetch(
+        """
+        SELECT task_type,
+               COUNT(*) FILTER (WHERE run_at <= NOW()) AS ready,
+               COUNT(*) FILTER (WHERE run_at > NOW()) AS scheduled,
+               EXTRACT(EPOCH FROM NOW() - MIN(run_at) FILTER (WHERE run_at <= NOW())) AS oldest_ready_age
+        FROM task_queue
+        WHERE status = 'pending'
+        GROUP BY task_type
+        """
+    )
+    processing = await conn.fetch(
+        """
+        SELECT task_type, COUNT(*) AS processing
+        FROM task_queue
+        WHERE status = 'processing'
+        GROUP BY task_type
+        """
+    )
+    depth = {}
+    for row in pending:
+        depth[row["task_type"]] = {
+            "ready": row["ready"],
+            "scheduled": row["scheduled"],
+            "processing": 0,
+            "oldest_ready_age": float(row["oldest_ready_age"]) if row["oldest_ready_age"] is not None else None,
+        }
+    for row in processing:
+        depth.setdefault(row["task_type"], {"ready": 0, "scheduled": 0, "oldest_ready_age": None})["processing"] = row["processing"]
+    return depth
+
+async def get_window_stats(conn, window_seconds:int) -> dict:
+    """
+    Queue wait (claimed_at - run_at) and execution time (finished_at - claimed_at)
+    percentiles per task_type over the last `window_seconds`. Finished tasks may
+    already be archived, so task_queue_history is read through the same indexes.
+    """
+    waits = await conn.fetch(
+        """
+        WITH claimed AS (
+            SELECT task_type, EXTRACT(EPOCH FROM claimed_at - run_at) AS wait
+            FROM task_queue
+            WHERE claimed_at > NOW() - make_interval(secs => $1)
+            UNION ALL
+            SELECT task_type, EXTRACT(EPOCH FROM claimed_at - run_at)
+            FROM task_queue_history
+            WHERE claimed_at > NOW() - make_interval(secs => $1)
+        )
+        SELECT task_type,
+               COUNT(*) AS claimed,
+               percentile_cont($2::float8[]) WITHIN GROUP (ORDER BY wait) AS wait,
+               AVG(wait) AS wait_avg,
+               MAX(wait) AS wait_max
+        FROM claimed
+        GROUP BY task_type
+        """,
+        window_seconds, list(METRICS_QUANTILES)
+    )
+    runs = await conn.fetch(
+        """
+        WITH finished AS (
+            SELECT task_type, status, EXTRACT(EPOCH FROM finished_at - claimed_at) AS run_time
+            FROM task_queue
+            WHERE finished_at > NOW() - make_interval(secs => $1)
+            UNION ALL
+            SELECT task_type, status, EXTRACT(EPOCH FROM finished_at - claimed_at)
+            FROM task_queue_history
+            WHERE finished_at > NOW() - make_interval(secs => $1)
+        )
+        SELECT task_type,
+               COUNT(*) FILTER (WHERE status = 'done') AS done,
+               COUNT(*) FILTER (WHERE status = 'failed') AS failed,
+               COUNT(*) FILTER (WHERE status = 'cancelled') AS cancelled,
+               percentile_cont($2::float8[]) WITHIN GROUP (ORDER BY run_time) AS run_time,
+               AVG(run_time) AS run_time_avg,
+               MAX(run_time) AS run_time_max
+        FROM finished
+        GROUP BY task_type
+        """,
+        window_seconds, list(METRICS_QUANTILES)
+    )
+    dead = await conn.fetch(
+        """
+        SELECT task_type, COUNT(*) AS dead
+        FROM task_dead_letter
+        WHERE failed_at > NOW() - make_interval(secs => $1)
+        GROUP BY task_type
+        """,
+        window_seconds
+    )
+    stats = {}
+    for row in waits:
+        entry = stats.setdefault(row["task_type"], _empty_window_stats())
+        entry["claimed"] = row["claimed"]
+        entry["wait"] = _quantiles(row, "wait")
+    for row in runs:
+        entry = stats.setdefault(row["task_type"], _empty_window_stats())
+        entry.update({"done": row["done"], "failed": row["failed"], "cancelled": row["cancelled"]})
+        entry["run_time"] = _quantiles(row, "run_time")
+    for row in dead:
+        stats.setdefault(row["task_type"], _empty_window_stats())["dead"] = row["dead"]
+    return stats
+
+async def get_queue_metrics(windows:list[int] | None = None):
+    """Returns (True, {"depth": {...}, "windows": {seconds: {task_type: {...}}}}) or (False, error_message)."""
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            depth = await get_queue_depth(conn)
+            stats = {}
+            for window in windows or METRICS_WINDOWS:
+                stats[window] = await get_window_stats(conn, window)
+        return True, {"depth": depth, "windows": stats}
+    except Exception as e:
+        return False, f"Could not get queue metrics - {e}"
+
+def _label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def format_prometheus(metrics:dict) -> str:
+    """Render get_queue_metrics() output in the Prometheus text exposition format."""
+    lines = []
+    def metric(name:str, kind:str, help_text:str, samples:list[tuple[dict, float]]):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            label_text = ",".join(f'{k}="{_label_value(v)}"' for k, v in labels.items())
+            lines.append(f"{name}{{{label_text}}} {value}")
+
+    depth = metrics["depth"]
+    metric(
+        "task_queue_depth", "gauge", "Tasks currently in task_queue by state.",
+        [
+            ({"task_type": task_type, "state": state}, values[state])
+            for task_type, values in depth.items()
+            for state in ("ready", "scheduled", "processing")
+        ]
+    )
+    metric(
+        "task_queue_oldest_ready_age_seconds", "gauge", "Age of the oldest task ready to run.",
+        [
+            ({"task_type": task_type}, values["oldest_ready_age"])
+            for task_type, values in depth.items() if values["oldest_ready_age"] is not None
+        ]
+    )
+
+    windows = metrics["windows"]
+    metric(
+        "task_queue_finished", "gauge", "Tasks that reached a final status within the window.",
+        [
+            ({"task_type": task_type, "status": status, "window": window}, entry[status])
+            for window, types in windows.items()
+            for task_type, entry in types.items()
+            for status in ("done", "failed", "cancelled", "dead")
+        ]
+    )
+    # Summaries: quantile samples plus _sum and _count over the same sliding window
+    for name, key, help_text, count_of in (
+        ("task_queue_wait_seconds", "wait", "Time from run_at until a worker claimed the task.", lambda e: e["claimed"]),
+        ("task_queue_run_seconds", "run_time", "Time from claim until the task finished.", lambda e: e["done"] + e["failed"] + e["cancelled"]),
+    ):
+        samples = []
+        totals = []
+        for window, types in windows.items():
+            for task_type, entry in types.items():
+                if not entry[key]:
+                    continue
+                for q in METRICS_QUANTILES:
+                    value = entry[key].get(f"p{int(q * 100)}")
+                    if value is not None:
+                        samples.append(({"task_type": task_type, "window": window, "quantile": q}, value))
+                totals.append(({"task_type": task_type, "window": window}, entry[key]["avg"], count_of(entry)))
+        metric(name, "summary", help_text, samples)
+        for labels, avg, count in totals:
+            label_text = ",".join(f'{k}="{_label_value(v)}"' for k, v in labels.items())
+            lines.append(f"{name}_sum{{{label_text}}} {avg * count}")
+            lines.append(f"{name}_count{{{label_text}}} {count}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,127 @@
+from datetime import datetime, timezone
+import json
+
+from croniter import croniter
+
+from db.pool import get_pool
+from db.queue_manager import insert_task, task_idempotency_key, default_max_attempts
+
+# Advisory lock key shared by every replica running the scheduler ("rcur")
+SCHEDULER_LOCK_KEY = 0x72637572
+
+def next_cron_run(cron:str, after:datetime | None = None) -> datetime:
+    return croniter(cron, after or datetime.now(timezone.utc)).get_next(datetime)
+
+async def add_recurring_task(name:str, cron:str, task_type:str, username:str, payload:dict | None = None, priority:int = 0, max_attempts:int | None = None, enabled:bool = True):
+    """Create or replace the recurring task called `name`; another user's task of that name is left alone."""
+    if not croniter.is_valid(cron):
+        return False, {"status": "Failed", "message": f"Invalid cron expression '{cron}'"}
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            result = await conn.execute(
+                """
+                INSERT INTO recurring_tasks (name, cron, task_type, payload, priority, max_attempts, username, enabled, next_run_at)
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+                ON CONFLICT (name) DO UPDATE
+                SET cron = EXCLUDED.cron,
+                    task_type = EXCLUDED.task_type,
+                    payload = EXCLUDED.payload,
+                    priority = EXCLUDED.priority,
+                    max_attempts = EXCLUDED.max_attempts,
+                    username = EXCLUDED.username,
+                    enabled = EXCLUDED.enabled,
+                    next_run_at = EXCLUDED.next_run_at
+                WHERE recurring_tasks.username = EXCLUDED.username
+                """,
+                name, cron, task_type,
+                json.dumps(payload) if payload is not None else None,
+                priority, max_attempts or default_max_attempts(task_type), username, enabled, next_cron_run(cron)
+            )
+        if result.split()[-1] == "0":
+            return False, {"status": "Failed", "message": f"Recurring task '{name}' belongs to another user"}
+        return True, {"status": "Done", "message": f"Recurring task '{name}' saved"}
+    except Exception as e:
+        return False, {"status": "Failed", "message": f"Could not save recurring task '{name}' - {e}"}
+
+async def list_recurring_tasks():
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch("SELECT * FROM recurring_tasks ORDER BY name")
+        return True, [dict(r) for r in rows]
+    except Exception as e:
+        return False, f"Could not list recurring tasks - {e}"
+
+async def set_recurring_task_enabled(name:str, enabled:bool, username:str):
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            cron = await conn.fetchval("SELECT cron FROM recurring_tasks WHERE name = $1 AND username = $2", name, username)
+            if cron is None:
+                return False, f"Recurring task '{name}' not found"
+            # Re-enabling starts from the next tick instead of firing the backlog
+            await conn.execute(
+                "UPDATE recurring_tasks SET enabled = $2, next_run_at = $3 WHERE name = $1 AND username = $4",
+                name, enabled, next_cron_run(cron), username
+            )
+        return True, f"Recurring task '{name}' {'enabled' if enabled else 'disabled'}"
+    except Exception as e:
+        return False, f"Could not update recurring task - {e}"
+
+async def delete_recurring_task(name:str, username:str):
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            result = await conn.execute("DELETE FROM recurring_tasks WHERE name = $1 AND username = $2", name, username)
+        if result.split()[-1] == "0":
+            return False, f"Recurring task '{name}' not found"
+        return True, f"Recurring task '{name}' deleted"
+    except Exception as e:
+        return False, f"Could not delete recurring task - {e}"
+
+async def materialize_due_recurring_tasks():
+    """
+    Enqueue one task for every recurring task that is due and advance its next_run_at.
+    Runs under a transaction-scoped advisory lock so that, with several replicas,
+    exactly one of them materializes a given tick. Missed ticks collapse into one run.
+    Returns (True, {"enqueued": n, ...}) or (False, error_message).
+    """
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                locked = await conn.fetchval("SELECT pg_try_advisory_xact_lock($1)", SCHEDULER_LOCK_KEY)
+                if not locked:
+                    return True, {"enqueued": 0, "message": "Scheduler tick is owned by another replica"}
+                due = await conn.fetch(
+                    """
+                    SELECT * FROM recurring_tasks
+                    WHERE enabled AND next_run_at <= NOW()
+                    ORDER BY next_run_at
+                    """
+                )
+                now = datetime.now(timezone.utc)
+                task_ids = []
+                coalesced = 0
+                for row in due:
+                    # A run still pending from the previous tick absorbs this one
+                    task_id, was_coalesced = await insert_task(
+                        conn, row["task_type"], row["username"], row["payload"],
+                        row["priority"], row["max_attempts"],
+                        idempotency_key=task_idempotency_key(row["task_type"], row["username"], row["payload"])
+                    )
+                    task_ids.append(task_id)
+                    coalesced += was_coalesced
+                    await conn.execute(
+                        "UPDATE recurring_tasks SET last_run_at = NOW(), next_run_at = $2 WHERE id = $1",
+                        row["id"], next_cron_run(row["cron"], now)
+                    )
+        return True, {
+            "enqueued": len(task_ids) - coalesced,
+            "coalesced": coalesced,
+            "task_ids": task_ids,
+            "message": f"Materialized {len(task_ids)} recurring tasks ({coalesced} coalesced)"
+        }
+    except Exception as e:
+        return False, f"Could not materialize recurring tasks - {e}"
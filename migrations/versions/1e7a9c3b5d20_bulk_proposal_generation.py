@@ -0,0 +1,63 @@
+"""bulk proposal generation
+
+Revision ID: 1e7a9c3b5d20
+Revises: f0b7d2c94e18
+Create Date: 2026-10-18 16:21:39.874502
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1e7a9c3b5d20'
+down_revision: Union[str, Sequence[str], None] = 'f0b7d2c94e18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Prompt version a proposal was generated with (0 = built-in backup prompt),
+    # so proposals can be regenerated after a prompt change.
+    op.execute("""
+        ALTER TABLE proposals
+        ADD COLUMN prompt_version INTEGER;
+    """)
+
+    op.execute("""
+        CREATE INDEX idx_jobs_created_at
+        ON jobs (created_at);
+    """)
+
+    op.execute("""
+        CREATE TABLE proposal_generation_runs (
+            id SERIAL PRIMARY KEY,
+            username TEXT,
+            filters JSONB,
+            prompt_version INTEGER,
+            concurrency INTEGER NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            succeeded INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            status TEXT NOT NULL DEFAULT 'running',
+            created_at TIMESTAMPTZ DEFAULT now(),
+            finished_at TIMESTAMPTZ
+        );
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("""
+        DROP TABLE IF EXISTS proposal_generation_runs;
+    """)
+    op.execute("""
+        DROP INDEX IF EXISTS idx_jobs_created_at;
+    """)
+    op.execute("""
+        ALTER TABLE proposals
+        DROP COLUMN prompt_version;
+    """)
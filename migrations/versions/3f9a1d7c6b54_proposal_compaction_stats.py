@@ -0,0 +1,35 @@
+"""proposal compaction stats
+
+Revision ID: 3f9a1d7c6b54
+Revises: b5e1a7c3d902
+Create Date: 2026-10-18 18:31:09.447215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9a1d7c6b54'
+down_revision: Union[str, Sequence[str], None] = 'b5e1a7c3d902'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Input tokens before/after compaction per LLM call of the generation
+    op.execute("""
+        ALTER TABLE proposals
+        ADD COLUMN compaction_stats JSONB;
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("""
+        ALTER TABLE proposals
+        DROP COLUMN IF EXISTS compaction_stats;
+    """)
@@ -0,0 +1,46 @@
+"""add lease columns to task_queue
+
+Revision ID: 4c1e9a7d2b35
+Revises: cbef2bdddd4a
+Create Date: 2026-10-18 09:12:40.118302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4c1e9a7d2b35'
+down_revision: Union[str, Sequence[str], None] = 'cbef2bdddd4a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""
+        ALTER TABLE task_queue
+        ADD COLUMN worker_id TEXT,
+        ADD COLUMN lease_until TIMESTAMPTZ;
+    """)
+
+    # Reaper only ever looks at in-flight rows
+    op.execute("""
+        CREATE INDEX idx_task_queue_lease
+        ON task_queue (lease_until)
+        WHERE status = 'processing';
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("""
+        DROP INDEX IF EXISTS idx_task_queue_lease;
+    """)
+    op.execute("""
+        ALTER TABLE task_queue
+        DROP COLUMN lease_until,
+        DROP COLUMN worker_id;
+    """)
@@ -0,0 +1,51 @@
+"""add recurring_tasks
+
+Revision ID: 5a8e2c0f7d43
+Revises: d27f4a8c6e19
+Create Date: 2026-10-18 11:26:08.437615
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a8e2c0f7d43'
+down_revision: Union[str, Sequence[str], None] = 'd27f4a8c6e19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""
+        CREATE TABLE recurring_tasks (
+            id SERIAL PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            cron TEXT NOT NULL,
+            task_type TEXT NOT NULL,
+            payload JSONB,
+            priority INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL DEFAULT 3,
+            username TEXT,
+            enabled BOOLEAN NOT NULL DEFAULT TRUE,
+            last_run_at TIMESTAMPTZ,
+            next_run_at TIMESTAMPTZ NOT NULL,
+            created_at TIMESTAMPTZ DEFAULT now()
+        );
+    """)
+
+    op.execute("""
+        CREATE INDEX idx_recurring_tasks_due
+        ON recurring_tasks (next_run_at)
+        WHERE enabled;
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("""
+        DROP TABLE IF EXISTS recurring_tasks;
+    """)
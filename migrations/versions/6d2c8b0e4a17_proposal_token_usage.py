@@ -0,0 +1,39 @@
+"""proposal token usage
+
+Revision ID: 6d2c8b0e4a17
+Revises: 3f9a1d7c6b54
+Create Date: 2026-10-18 19:04:52.310968
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6d2c8b0e4a17'
+down_revision: Union[str, Sequence[str], None] = '3f9a1d7c6b54'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Token usage of the proposal LLM call; cached_input_tokens is the part served from the provider's prompt cache
+    op.execute("""
+        ALTER TABLE proposals
+        ADD COLUMN input_tokens INTEGER,
+        ADD COLUMN cached_input_tokens INTEGER,
+        ADD COLUMN output_tokens INTEGER;
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("""
+        ALTER TABLE proposals
+        DROP COLUMN IF EXISTS input_tokens,
+        DROP COLUMN IF EXISTS cached_input_tokens,
+        DROP COLUMN IF EXISTS output_tokens;
+    """)
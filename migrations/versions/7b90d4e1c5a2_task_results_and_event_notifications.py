@@ -0,0 +1,102 @@
+"""task results and event notifications
+
+Revision ID: 7b90d4e1c5a2
+Revises: e61c3b9f42a7
+Create Date: 2026-10-18 13:14:29.760218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b90d4e1c5a2'
+down_revision: Union[str, Sequence[str], None] = 'e61c3b9f42a7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""
+        ALTER TABLE task_queue
+        ADD COLUMN result JSONB;
+    """)
+
+    op.execute("""
+        ALTER TABLE task_queue_history
+        ADD COLUMN result JSONB;
+    """)
+
+    # Every status transition is published on 'task_events', whichever code path made it.
+    # Payloads stay small (NOTIFY caps them at 8000 bytes); results are read from the row.
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notify_task_event() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('task_events', json_build_object(
+                'id', NEW.id,
+                'task_type', NEW.task_type,
+                'username', NEW.username,
+                'status', NEW.status,
+                'attempts', NEW.attempts,
+                'updated_at', NEW.updated_at
+            )::text);
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    op.execute("""
+        CREATE TRIGGER task_queue_insert_event
+        AFTER INSERT ON task_queue
+        FOR EACH ROW EXECUTE FUNCTION notify_task_event();
+    """)
+
+    op.execute("""
+        CREATE TRIGGER task_queue_status_event
+        AFTER UPDATE OF status ON task_queue
+        FOR EACH ROW
+        WHEN (OLD.status IS DISTINCT FROM NEW.status)
+        EXECUTE FUNCTION notify_task_event();
+    """)
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notify_task_dead_letter_event() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('task_events', json_build_object(
+                'id', NEW.task_id,
+                'task_type', NEW.task_type,
+                'username', NEW.username,
+                'status', 'dead',
+                'attempts', NEW.attempts,
+                'updated_at', NEW.failed_at
+            )::text);
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    op.execute("""
+        CREATE TRIGGER task_dead_letter_insert_event
+        AFTER INSERT ON task_dead_letter
+        FOR EACH ROW EXECUTE FUNCTION notify_task_dead_letter_event();
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS task_dead_letter_insert_event ON task_dead_letter;")
+    op.execute("DROP FUNCTION IF EXISTS notify_task_dead_letter_event();")
+    op.execute("DROP TRIGGER IF EXISTS task_queue_status_event ON task_queue;")
+    op.execute("DROP TRIGGER IF EXISTS task_queue_insert_event ON task_queue;")
+    op.execute("DROP FUNCTION IF EXISTS notify_task_event();")
+    op.execute("""
+        ALTER TABLE task_queue_history
+        DROP COLUMN result;
+    """)
+    op.execute("""
+        ALTER TABLE task_queue
+        DROP COLUMN result;
+    """)
@@ -0,0 +1,79 @@
+"""proposal cache
+
+Revision ID: 8c2f4d6a9e31
+Revises: 1e7a9c3b5d20
+Create Date: 2026-10-18 17:05:12.440918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c2f4d6a9e31'
+down_revision: Union[str, Sequence[str], None] = '1e7a9c3b5d20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""
+        CREATE EXTENSION IF NOT EXISTS vector;
+    """)
+
+    # generated, cache_exact or cache_semantic
+    op.execute("""
+        ALTER TABLE proposals
+        ADD COLUMN source TEXT NOT NULL DEFAULT 'generated';
+    """)
+
+    op.execute("""
+        CREATE TABLE proposal_cache (
+            id SERIAL PRIMARY KEY,
+            input_hash TEXT NOT NULL UNIQUE,
+            prompt_version INTEGER NOT NULL,
+            model TEXT NOT NULL,
+            questions_hash TEXT NOT NULL,
+            job_type TEXT,
+            job_summary TEXT,
+            embedding vector(1536),
+            proposal JSONB NOT NULL,
+            hits INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMPTZ DEFAULT now(),
+            last_hit_at TIMESTAMPTZ
+        );
+    """)
+
+    op.execute("""
+        CREATE INDEX idx_proposal_cache_embedding
+        ON proposal_cache USING hnsw (embedding vector_cosine_ops);
+    """)
+
+    op.execute("""
+        CREATE INDEX idx_proposal_cache_created_at
+        ON proposal_cache (created_at);
+    """)
+
+    op.execute("""
+        CREATE TABLE proposal_cache_counters (
+            name TEXT PRIMARY KEY,
+            count BIGINT NOT NULL DEFAULT 0
+        );
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("""
+        DROP TABLE IF EXISTS proposal_cache_counters;
+    """)
+    op.execute("""
+        DROP TABLE IF EXISTS proposal_cache;
+    """)
+    op.execute("""
+        ALTER TABLE proposals
+        DROP COLUMN source;
+    """)
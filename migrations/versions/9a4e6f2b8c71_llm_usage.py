@@ -0,0 +1,59 @@
+"""llm usage
+
+Revision ID: 9a4e6f2b8c71
+Revises: 6d2c8b0e4a17
+Create Date: 2026-10-18 19:48:27.905133
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4e6f2b8c71'
+down_revision: Union[str, Sequence[str], None] = '6d2c8b0e4a17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # One row per graph node per proposal generation
+    op.execute("""
+        CREATE TABLE llm_usage (
+            id BIGSERIAL PRIMARY KEY,
+            job_url TEXT,
+            prompt_version INTEGER,
+            task_id BIGINT,
+            node TEXT NOT NULL,
+            model TEXT,
+            calls INTEGER NOT NULL DEFAULT 0,
+            retries INTEGER NOT NULL DEFAULT 0,
+            input_tokens INTEGER NOT NULL DEFAULT 0,
+            cached_input_tokens INTEGER NOT NULL DEFAULT 0,
+            output_tokens INTEGER NOT NULL DEFAULT 0,
+            latency_ms INTEGER,
+            cost_usd NUMERIC(12, 6) NOT NULL DEFAULT 0,
+            created_at TIMESTAMPTZ DEFAULT now()
+        );
+    """)
+
+    op.execute("""
+        CREATE INDEX idx_llm_usage_created_at
+        ON llm_usage (created_at)
+        INCLUDE (node, cost_usd, latency_ms);
+    """)
+
+    op.execute("""
+        CREATE INDEX idx_llm_usage_job_url
+        ON llm_usage (job_url);
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("""
+        DROP TABLE IF EXISTS llm_usage;
+    """)
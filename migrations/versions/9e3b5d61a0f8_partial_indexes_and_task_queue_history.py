@@ -0,0 +1,79 @@
+"""partial indexes and task_queue_history
+
+Revision ID: 9e3b5d61a0f8
+Revises: 4c1e9a7d2b35
+Create Date: 2026-10-18 10:03:17.552904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e3b5d61a0f8'
+down_revision: Union[str, Sequence[str], None] = '4c1e9a7d2b35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Dequeue only ever reads pending rows; task_type is included so the
+    # per-type filter of the claim query is answered from the index.
+    op.execute("""
+        CREATE INDEX idx_task_queue_pending
+        ON task_queue (priority DESC, created_at)
+        INCLUDE (task_type)
+        WHERE status = 'pending';
+    """)
+
+    op.execute("""
+        DROP INDEX IF EXISTS idx_task_queue_priority;
+    """)
+
+    # Lets the archiver find finished rows without touching the live ones
+    op.execute("""
+        CREATE INDEX idx_task_queue_finished
+        ON task_queue (updated_at)
+        WHERE status NOT IN ('pending', 'processing');
+    """)
+
+    # TASK QUEUE HISTORY
+    op.execute("""
+        CREATE TABLE task_queue_history (
+            id INTEGER PRIMARY KEY,
+            task_type TEXT NOT NULL,
+            username TEXT,
+            payload JSONB,
+            priority INTEGER,
+            status TEXT NOT NULL,
+            worker_id TEXT,
+            created_at TIMESTAMPTZ,
+            updated_at TIMESTAMPTZ,
+            archived_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+    """)
+
+    op.execute("""
+        CREATE INDEX idx_task_queue_history_type_updated
+        ON task_queue_history (task_type, updated_at);
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("""
+        DROP TABLE IF EXISTS task_queue_history;
+    """)
+    op.execute("""
+        DROP INDEX IF EXISTS idx_task_queue_finished;
+    """)
+    op.execute("""
+        CREATE INDEX idx_task_queue_priority
+        ON task_queue (priority DESC, created_at);
+    """)
+    op.execute("""
+        DROP INDEX IF EXISTS idx_task_queue_pending;
+    """)
@@ -0,0 +1,74 @@
+"""fair share scheduling
+
+Revision ID: a4f6c2e8b1d9
+Revises: 7b90d4e1c5a2
+Create Date: 2026-10-18 14:37:51.018447
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4f6c2e8b1d9'
+down_revision: Union[str, Sequence[str], None] = '7b90d4e1c5a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""
+        ALTER TABLE task_queue
+        ADD COLUMN claimed_at TIMESTAMPTZ;
+    """)
+
+    op.execute("""
+        ALTER TABLE task_queue_history
+        ADD COLUMN claimed_at TIMESTAMPTZ;
+    """)
+
+    # Recent claims per user drive the fair-share ordering and wait-time stats
+    op.execute("""
+        CREATE INDEX idx_task_queue_claimed_at
+        ON task_queue (claimed_at)
+        INCLUDE (username)
+        WHERE claimed_at IS NOT NULL;
+    """)
+
+    op.execute("""
+        CREATE INDEX idx_task_queue_history_claimed_at
+        ON task_queue_history (claimed_at)
+        WHERE claimed_at IS NOT NULL;
+    """)
+
+    op.execute("""
+        CREATE TABLE task_queue_user_shares (
+            username TEXT PRIMARY KEY,
+            weight REAL NOT NULL DEFAULT 1 CHECK (weight > 0),
+            updated_at TIMESTAMPTZ DEFAULT now()
+        );
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("""
+        DROP TABLE IF EXISTS task_queue_user_shares;
+    """)
+    op.execute("""
+        DROP INDEX IF EXISTS idx_task_queue_history_claimed_at;
+    """)
+    op.execute("""
+        DROP INDEX IF EXISTS idx_task_queue_claimed_at;
+    """)
+    op.execute("""
+        ALTER TABLE task_queue_history
+        DROP COLUMN claimed_at;
+    """)
+    op.execute("""
+        ALTER TABLE task_queue
+        DROP COLUMN claimed_at;
+    """)
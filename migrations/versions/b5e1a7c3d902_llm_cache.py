@@ -0,0 +1,46 @@
+"""llm cache
+
+Revision ID: b5e1a7c3d902
+Revises: 8c2f4d6a9e31
+Create Date: 2026-10-18 17:42:56.208117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5e1a7c3d902'
+down_revision: Union[str, Sequence[str], None] = '8c2f4d6a9e31'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Content-hash keyed results of deterministic-enough model calls
+    # (kind = 'rag_query', 'embedding:<model>', ...)
+    op.execute("""
+        CREATE TABLE llm_cache (
+            kind TEXT NOT NULL,
+            content_hash TEXT NOT NULL,
+            value JSONB NOT NULL,
+            created_at TIMESTAMPTZ DEFAULT now(),
+            last_used_at TIMESTAMPTZ DEFAULT now(),
+            PRIMARY KEY (kind, content_hash)
+        );
+    """)
+
+    op.execute("""
+        CREATE INDEX idx_llm_cache_last_used
+        ON llm_cache (kind, last_used_at DESC);
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("""
+        DROP TABLE IF EXISTS llm_cache;
+    """)
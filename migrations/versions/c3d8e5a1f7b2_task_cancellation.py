@@ -0,0 +1,43 @@
+"""task cancellation
+
+Revision ID: c3d8e5a1f7b2
+Revises: a4f6c2e8b1d9
+Create Date: 2026-10-18 15:12:04.662913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3d8e5a1f7b2'
+down_revision: Union[str, Sequence[str], None] = 'a4f6c2e8b1d9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""
+        ALTER TABLE task_queue
+        ADD COLUMN cancel_requested BOOLEAN NOT NULL DEFAULT FALSE;
+    """)
+
+    op.execute("""
+        ALTER TABLE task_queue_history
+        ADD COLUMN cancel_requested BOOLEAN NOT NULL DEFAULT FALSE;
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("""
+        ALTER TABLE task_queue_history
+        DROP COLUMN cancel_requested;
+    """)
+    op.execute("""
+        ALTER TABLE task_queue
+        DROP COLUMN cancel_requested;
+    """)
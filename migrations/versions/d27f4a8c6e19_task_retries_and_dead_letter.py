@@ -0,0 +1,100 @@
+"""task retries and dead letter table
+
+Revision ID: d27f4a8c6e19
+Revises: 9e3b5d61a0f8
+Create Date: 2026-10-18 10:41:52.903116
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd27f4a8c6e19'
+down_revision: Union[str, Sequence[str], None] = '9e3b5d61a0f8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""
+        ALTER TABLE task_queue
+        ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0,
+        ADD COLUMN max_attempts INTEGER NOT NULL DEFAULT 3,
+        ADD COLUMN run_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        ADD COLUMN error TEXT;
+    """)
+
+    op.execute("""
+        ALTER TABLE task_queue_history
+        ADD COLUMN attempts INTEGER,
+        ADD COLUMN max_attempts INTEGER,
+        ADD COLUMN run_at TIMESTAMPTZ,
+        ADD COLUMN error TEXT;
+    """)
+
+    # run_at joins the covered columns so delayed rows are skipped from the index
+    op.execute("""
+        DROP INDEX IF EXISTS idx_task_queue_pending;
+    """)
+    op.execute("""
+        CREATE INDEX idx_task_queue_pending
+        ON task_queue (priority DESC, created_at)
+        INCLUDE (task_type, run_at)
+        WHERE status = 'pending';
+    """)
+
+    # DEAD LETTER
+    op.execute("""
+        CREATE TABLE task_dead_letter (
+            id SERIAL PRIMARY KEY,
+            task_id INTEGER NOT NULL,
+            task_type TEXT NOT NULL,
+            username TEXT,
+            payload JSONB,
+            priority INTEGER,
+            attempts INTEGER NOT NULL,
+            max_attempts INTEGER NOT NULL,
+            last_error TEXT,
+            created_at TIMESTAMPTZ,
+            failed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+    """)
+
+    op.execute("""
+        CREATE INDEX idx_task_dead_letter_failed_at
+        ON task_dead_letter (failed_at DESC);
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("""
+        DROP TABLE IF EXISTS task_dead_letter;
+    """)
+    op.execute("""
+        DROP INDEX IF EXISTS idx_task_queue_pending;
+    """)
+    op.execute("""
+        CREATE INDEX idx_task_queue_pending
+        ON task_queue (priority DESC, created_at)
+        INCLUDE (task_type)
+        WHERE status = 'pending';
+    """)
+    op.execute("""
+        ALTER TABLE task_queue_history
+        DROP COLUMN error,
+        DROP COLUMN run_at,
+        DROP COLUMN max_attempts,
+        DROP COLUMN attempts;
+    """)
+    op.execute("""
+        ALTER TABLE task_queue
+        DROP COLUMN error,
+        DROP COLUMN run_at,
+        DROP COLUMN max_attempts,
+        DROP COLUMN attempts;
+    """)
@@ -0,0 +1,53 @@
+"""add task idempotency key
+
+Revision ID: e61c3b9f42a7
+Revises: 5a8e2c0f7d43
+Create Date: 2026-10-18 12:02:45.281930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e61c3b9f42a7'
+down_revision: Union[str, Sequence[str], None] = '5a8e2c0f7d43'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""
+        ALTER TABLE task_queue
+        ADD COLUMN idempotency_key TEXT;
+    """)
+
+    op.execute("""
+        ALTER TABLE task_queue_history
+        ADD COLUMN idempotency_key TEXT;
+    """)
+
+    # Only live work is deduplicated; finished rows may share a key
+    op.execute("""
+        CREATE UNIQUE INDEX uq_task_queue_active_idempotency_key
+        ON task_queue (idempotency_key)
+        WHERE status IN ('pending', 'processing');
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("""
+        DROP INDEX IF EXISTS uq_task_queue_active_idempotency_key;
+    """)
+    op.execute("""
+        ALTER TABLE task_queue_history
+        DROP COLUMN idempotency_key;
+    """)
+    op.execute("""
+        ALTER TABLE task_queue
+        DROP COLUMN idempotency_key;
+    """)
@@ -0,0 +1,102 @@
+"""task queue telemetry
+
+Revision ID: f0b7d2c94e18
+Revises: c3d8e5a1f7b2
+Create Date: 2026-10-18 15:48:27.305164
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f0b7d2c94e18'
+down_revision: Union[str, Sequence[str], None] = 'c3d8e5a1f7b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""
+        ALTER TABLE task_queue
+        ADD COLUMN finished_at TIMESTAMPTZ;
+    """)
+
+    op.execute("""
+        ALTER TABLE task_queue_history
+        ADD COLUMN finished_at TIMESTAMPTZ;
+    """)
+
+    # Stamped in the database so every path that ends a task (worker, cancel,
+    # reaper, manual status updates) is covered.
+    op.execute("""
+        CREATE OR REPLACE FUNCTION set_task_finished_at() RETURNS trigger AS $$
+        BEGIN
+            IF NEW.status IN ('done', 'failed', 'cancelled') THEN
+                NEW.finished_at = NOW();
+            ELSE
+                NEW.finished_at = NULL;
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    op.execute("""
+        CREATE TRIGGER task_queue_set_finished_at
+        BEFORE UPDATE OF status ON task_queue
+        FOR EACH ROW
+        WHEN (OLD.status IS DISTINCT FROM NEW.status)
+        EXECUTE FUNCTION set_task_finished_at();
+    """)
+
+    # Sliding-window metrics range-scan these instead of reading the whole table
+    op.execute("""
+        CREATE INDEX idx_task_queue_finished_at
+        ON task_queue (finished_at)
+        INCLUDE (task_type, status)
+        WHERE finished_at IS NOT NULL;
+    """)
+
+    op.execute("""
+        CREATE INDEX idx_task_queue_history_finished_at
+        ON task_queue_history (finished_at)
+        WHERE finished_at IS NOT NULL;
+    """)
+
+    # Depth of running work by type without touching finished rows
+    op.execute("""
+        CREATE INDEX idx_task_queue_processing_type
+        ON task_queue (task_type)
+        WHERE status = 'processing';
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("""
+        DROP INDEX IF EXISTS idx_task_queue_processing_type;
+    """)
+    op.execute("""
+        DROP INDEX IF EXISTS idx_task_queue_history_finished_at;
+    """)
+    op.execute("""
+        DROP INDEX IF EXISTS idx_task_queue_finished_at;
+    """)
+    op.execute("""
+        DROP TRIGGER IF EXISTS task_queue_set_finished_at ON task_queue;
+    """)
+    op.execute("""
+        DROP FUNCTION IF EXISTS set_task_finished_at();
+    """)
+    op.execute("""
+        ALTER TABLE task_queue_history
+        DROP COLUMN finished_at;
+    """)
+    op.execute("""
+        ALTER TABLE task_queue
+        DROP COLUMN finished_at;
+    """)
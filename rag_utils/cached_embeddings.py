@@ -0,0 +1,50 @@
+from langchain_core.embeddings import Embeddings
+
+from utils.persistent_cache import PersistentLRUCache, content_hash
+from utils.openai_governor import governor, estimate_tokens
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an Embeddings model with a content-hash keyed PersistentLRUCache, so
+    repeated texts (regenerations, reruns) skip the embeddings API call.
+    Only the async path is cached and goes through the OpenAI governor; the
+    sync methods are kept for the Embeddings interface and go straight to the model.
+    """
+    def __init__(self, embeddings: Embeddings, model: str):
+        self.embeddings = embeddings
+        self.model = model
+        self.cache = PersistentLRUCache(f"embedding:{model}")
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        key = content_hash(self.model, text)
+        hit, vector = await self.cache.get(key)
+        if hit:
+            return vector
+        async with governor.slot(estimate_tokens(text)):
+            vector = await self.embeddings.aembed_query(text)
+        await self.cache.set(key, vector)
+        return vector
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys = [content_hash(self.model, text) for text in texts]
+        vectors: list[list[float] | None] = []
+        missing = []
+        for index, key in enumerate(keys):
+            hit, vector = await self.cache.get(key)
+            vectors.append(vector if hit else None)
+            if not hit:
+                missing.append(index)
+        if missing:
+            batch = [texts[i] for i in missing]
+            async with governor.slot(sum(estimate_tokens(text) for text in batch)):
+                embedded = await self.embeddings.aembed_documents(batch)
+            for index, vector in zip(missing, embedded):
+                vectors[index] = vector
+                await self.cache.set(keys[index], vector)
+        return vectors
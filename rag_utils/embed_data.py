@@ -11,8 +11,10 @@ from langchain_postgres import PGVector
 from langchain.schema import Document
 from langchain_openai import OpenAIEmbeddings
 
-from db.pool import get_pool,close_pool, init_pool, DB_CONNECTION_STRING, \
+from db.pool import get_pool,close_pool, init_pool, DB_CONNECTION_STRING, ASYNC_DB_CONNECTION_STRING, \
     POSTGRES_USER, POSTGRES_PASSWORD_RAW, POSTGRES_DB, POSTGRES_HOST
+from rag_utils.cached_embeddings import CachedEmbeddings
+from utils.openai_governor import governor, llm_priority, estimate_tokens, BACKGROUND
 
 load_dotenv()
 
@@ -29,6 +31,32 @@ async def ensure_pgvector():
 
 embedding_model = OpenAIEmbeddings(model="text-embedding-3-large")
 
+# Retrieval queries repeat across regenerations, so their embeddings are cached
+cached_embedding_model = CachedEmbeddings(embedding_model, "text-embedding-3-large")
+
+PROPOSAL_EMBEDDINGS_COLLECTION = "proposal_embeddings"
+SEED_BATCH_SIZE = 64  # documents per embeddings request when seeding
+
+# Job summaries for the proposal cache; proposal_cache.embedding is vector(1536)
+summary_embedding_model = CachedEmbeddings(OpenAIEmbeddings(model="text-embedding-3-small"), "text-embedding-3-small")
+
+vector_store = None  # per-process async store, created on first use
+
+def get_vector_store() -> PGVector:
+    """
+    Shared async PGVector store for retrieval. One engine and connection pool
+    per process instead of a new synchronous store per search.
+    """
+    global vector_store
+    if vector_store is None:
+        vector_store = PGVector(
+            embeddings=cached_embedding_model,
+            collection_name=PROPOSAL_EMBEDDINGS_COLLECTION,
+            connection=ASYNC_DB_CONNECTION_STRING,
+            async_mode=True,
+        )
+    return vector_store
+
 def create_docs_from_csv(file_path):
     df = pd.read_csv(file_path)
     columns = df.columns.tolist()
@@ -49,17 +77,26 @@ def create_docs_from_csv(file_path):
         
     return documents
 
-def embed_documents(documents:List[Document]):
+async def embed_documents(documents:List[Document], batch_size:int = SEED_BATCH_SIZE):
+    """
+    Seed the vector store in batches. Each batch is embedded with the raw model
+    (seed texts are never looked up again, so they stay out of the LLM cache)
+    under the OpenAI governor at background priority.
+    """
+    priority = llm_priority.set(BACKGROUND)
     try:
-        PGVector.from_documents(
-            documents=documents,
-            embedding=embedding_model,
-            collection_name="proposal_embeddings",
-            connection=DB_CONNECTION_STRING
-            )
+        store = get_vector_store()
+        for start in range(0, len(documents), batch_size):
+            batch = documents[start:start + batch_size]
+            texts = [doc.page_content for doc in batch]
+            async with governor.slot(sum(estimate_tokens(text) for text in texts)):
+                vectors = await embedding_model.aembed_documents(texts)
+            await store.aadd_embeddings(texts, vectors, metadatas=[doc.metadata for doc in batch])
         print(f"Successfully embedded {len(documents)} documents.")
     except Exception as e:
         print(f"Error embedding documents: {e}")
+    finally:
+        llm_priority.reset(priority)
         
 def retrieve_similar_documents(query:str, top_k:int=5):
     try:
@@ -1,12 +1,13 @@
 from datetime import datetime, timedelta, timezone
 from jose import jwt, JWTError
 from passlib.context import CryptContext
-from fastapi import HTTPException, Cookie
+from fastapi import HTTPException, Cookie, Depends
 import os
 
 SECRET_KEY = os.getenv("SECRET_KEY", "CHANGE_ME_NOW") #TODO: Move to env variable and make it more secure in production
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 8  # 8 hours
+ADMIN_USERS = {user.strip() for user in os.getenv("ADMIN_USERS", "").split(",") if user.strip()}
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -39,4 +40,9 @@ async def require_auth(
         payload = decode_access_token(access_token)
         return payload["sub"]
     except JWTError:
-        raise HTTPException(status_code=401)
\ No newline at end of file
+        raise HTTPException(status_code=401)
+
+async def require_admin(user: str = Depends(require_auth)):
+    if user not in ADMIN_USERS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user
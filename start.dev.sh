@@ -38,5 +38,8 @@ echo "✅ Chrome CDP is available!"
 
 alembic upgrade head
 
+echo "✅ Starting task worker..."
+python -m worker &
+
 echo "✅ Starting FastAPI server..."
 exec uvicorn main:app --host 0.0.0.0 --port 8000 --reload
\ No newline at end of file
@@ -38,5 +38,8 @@ echo "✅ Chrome CDP is available!"
 
 alembic upgrade head
 
+echo "✅ Starting task worker..."
+python -m worker &
+
 echo "✅ Starting FastAPI server..."
-exec uvicorn main:app --host 0.0.0.0 --port 8000
\ No newline at end of file
+exec uvicorn main:app --host 0.0.0.0 --port 8000 --workers "${API_WORKERS:-2}"
\ No newline at end of file
@@ -3,6 +3,8 @@ from typing import Optional
 from nyx.browser import NyxBrowser
 from nyx.page import NyxPage
 from utils.prompts_archive import PromptArchive
+from worker.supervisor import WorkerSupervisor
+from db.queue_listener import TaskEventBroadcaster
 
 from fastapi import Request
 
@@ -17,13 +19,9 @@ class AppState:
         self.prompt_archive:PromptArchive = None
         self.bidder_agent = None
 
-        self.proposal_prompt_changed = True
-        
-        self.proposal_system_prompt = None
-        
-        self.prompt_lock = asyncio.Lock()
-
         self.worker_task: Optional[asyncio.Task] = None
+        self.worker_supervisor: Optional[WorkerSupervisor] = None
+        self.task_events: Optional[TaskEventBroadcaster] = None
         
 def get_app_state(request:Request):
     return request.app.state.core
\ No newline at end of file
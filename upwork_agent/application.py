@@ -1,9 +1,10 @@
 from utils.session import Session
 from utils.constants import upwork_login_url, cloudfare_challenge_div_id, upwork_url, home_url, send_job_updates_webhook_url, send_job_updates_webhook_url_test
 from utils.models import Proposal
+from utils.exceptions import TaskCancelledError
+from utils.cancellation import CancellationToken
 
 from db.proposals import get_proposal_by_url, update_proposal_by_url
-from db.queue_manager import update_task_status
 from db.jobs import change_proposal_generation_status
 
 from typing import Literal, Optional
@@ -22,14 +23,19 @@ class ApplicationSession(Session):
                  human:str,
                  security_answer:str = None, 
                  status_endpoint:str = send_job_updates_webhook_url,
+                 cancel_token:CancellationToken = None,
                  ):
-        super().__init__(task_id, page, username, password, security_answer, status_endpoint)
+        super().__init__(task_id, page, username, password, security_answer, status_endpoint, cancel_token=cancel_token)
         self.job_url = job_url
         self.human = human
         self.applied = False
         self.proposal:Optional[Proposal] = None
         self.proposal_type:Optional[Literal["Hourly", "Fixed Price"]] = None
         
+    async def reset_page(self):
+        await self.close_client()
+        await self.page.goto(home_url)
+
     async def run(self):
         try:
             client_setup_success = await self.setup_client()
@@ -40,44 +46,56 @@ class ApplicationSession(Session):
         try:
             client_setup_success = await self.setup_client()
             if not client_setup_success:
-                await update_task_status(self.task_id, "failed")
                 return False
             proposal_fetch_status = await self.get_proposal()
             if not proposal_fetch_status:
                 await self.send_status()
                 self.print_status()
-                await update_task_status(self.task_id, "failed")
                 return False
+            self.check_cancelled()
             login_status = await self.login(upwork_login_url)
             if not login_status:
                 await self.send_status()
                 self.print_status()
-                await update_task_status(self.task_id, "failed")
                 return False
+            self.check_cancelled()
             reach_bidding_page_status = await self.reach_bidding_page()
             if not reach_bidding_page_status:
                 await self.send_status()
                 self.print_status()
-                await update_task_status(self.task_id, "failed")
                 return False
+            self.check_cancelled()
             apply_status = await self.apply_for_job()
             if not apply_status:
                 await self.send_status()
                 self.print_status()
-                await update_task_status(self.task_id, "failed")
                 return False
             update_proposal_status = await self.update_proposal_status()
             if not update_proposal_status:
                 await self.send_status()
                 self.print_status()
                 return False
-            await update_task_status(self.task_id, "completed")
             self.update_status("Success", "Application process completed successfully")
             await self.send_status()
             self.print_status()
             await self.close_client()
             await self.page.goto(home_url)
             return True
+        except TaskCancelledError:
+            self.update_status("Cancelled", "Application cancelled before the proposal was filled in")
+            await self.send_status()
+            self.print_status()
+            await self.close_client()
+            await self.page.goto(home_url)
+            raise
+        except asyncio.CancelledError:
+            # Stopped outright (worker shutdown): still hand the shared page back clean
+            print(f"{type(self).__name__} interrupted, resetting the browser page")
+            try:
+                await asyncio.shield(self.reset_page())
+            except Exception as e:
+                print(f"Error resetting the browser page: {e}")
+            raise
         except Exception as e:
             print("taking screenshot of error")
             await self.page.take_screenshot(filename=f"screenshots/application_session_error_{self.task_id}.png")
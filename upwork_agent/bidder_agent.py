@@ -1,26 +1,71 @@
+import asyncio
 import json
+import os
 from dotenv import load_dotenv
 import traceback
 
 from langchain.chat_models import init_chat_model
-from langchain_postgres import PGVector
 from langgraph.graph import StateGraph
 
-from db.jobs import get_job_by_url, change_proposal_generation_status
+from db.jobs import get_job_by_url, reset_failed_generation
+from db.locks import advisory_lock
 from state import AppState
 from utils.models import *
-from rag_utils.embed_data import DB_CONNECTION_STRING, embedding_model
+from rag_utils.embed_data import get_vector_store, summary_embedding_model
 
 from langchain_core.messages import SystemMessage, HumanMessage
 
-from db.proposals import add_proposal
+from db.proposals import store_generated_proposal, get_proposal_prompt_version
+from db.proposal_cache import proposal_cache_key, questions_hash, count_cache_event, \
+    get_exact_cached_proposal, get_similar_cached_proposal, add_cached_proposal
+from utils.single_flight import SingleFlight
+from utils.persistent_cache import PersistentLRUCache, content_hash
+from utils.llm_resilience import ResilientModel, ModelTarget, CircuitBreaker, node_budget
+from utils.openai_governor import GovernedModel, usage_metadata
+from utils.usage_ledger import UsageLedger
+from db.llm_usage import queue_llm_usage
+from utils.compaction import compact_job_details, compact_projects, token_savings, trim_to_tokens, normalize_whitespace, \
+    JOB_SUMMARY_TOKEN_BUDGET
 
 load_dotenv()
     
 llm_name = "openai:gpt-5"
+retriever_llm_name = "openai:gpt-5-nano"
+
+# Any OpenAI-compatible endpoint (a replica, or a local fake server for testing).
+# The hedge/fallback target defaults to the same model, i.e. a second request.
+LLM_BASE_URL = os.getenv("LLM_BASE_URL")
+LLM_FALLBACK_MODEL = os.getenv("LLM_FALLBACK_MODEL", llm_name)
+RETRIEVER_FALLBACK_MODEL = os.getenv("RETRIEVER_FALLBACK_MODEL", retriever_llm_name)
+LLM_FALLBACK_BASE_URL = os.getenv("LLM_FALLBACK_BASE_URL", LLM_BASE_URL)
+
+def chat_model(name:str, base_url:str | None):
+    # Retries are done by ResilientModel within the node budget
+    return init_chat_model(name, base_url=base_url, max_retries=0)
+
+def model_targets(primary:str, fallback:str, output_tokens:int, wrap = lambda model: model) -> list[ModelTarget]:
+    # Every attempt, hedges included, is admitted by the process-wide OpenAI governor
+    return [
+        ModelTarget(primary, GovernedModel(wrap(chat_model(primary, LLM_BASE_URL)), output_tokens), CircuitBreaker(primary)),
+        ModelTarget(
+            f"{fallback} (fallback)",
+            GovernedModel(wrap(chat_model(fallback, LLM_FALLBACK_BASE_URL)), output_tokens),
+            CircuitBreaker(f"{fallback} (fallback)")
+        ),
+    ]
+
+retriever_llm = ResilientModel(
+    "generate_search_query",
+    model_targets(retriever_llm_name, RETRIEVER_FALLBACK_MODEL, output_tokens=500),
+    node_budget("generate_search_query", budget=20, hedge_delay=4),
+    is_good=lambda response: bool(response.content and response.content.strip())
+)
 
-llm = init_chat_model(llm_name)
-retriever_llm = init_chat_model("openai:gpt-5-nano")
+# Speculative retrieval: search on the raw job summary while the query LLM runs,
+# then merge in the LLM-query results if they arrive within the budget (seconds)
+SPECULATIVE_RETRIEVAL = os.getenv("BIDDER_SPECULATIVE_RETRIEVAL", "true").lower() in ("1", "true", "yes")
+RETRIEVAL_QUERY_BUDGET = float(os.getenv("RETRIEVAL_QUERY_BUDGET", "6"))
+RETRIEVAL_TOP_K = 5
 
 RETRIEVAL_SYSTEM_PROMPT = """
             You are a specialized query generator for an Upwork proposal system.
@@ -184,72 +229,192 @@ PROPOSAL_SYSTEM_PROMPT_BACKUP = """
             - Give tailored, clear answers
 """
 
-def retrieve(
+# Nodes are async so that LLM calls and vector search yield to the event loop
+# instead of blocking API requests and other generations while they run.
+async def retrieve(
     state:State,
     ):
     rag_query = state.get("rag_query", "")
-    retriever = PGVector(
-            embeddings=embedding_model,
-            collection_name="proposal_embeddings",
-            connection=DB_CONNECTION_STRING
-        )
-    retrieved_docs = retriever.similarity_search(query = rag_query, k = 5)
-    serialised = "\n\n".join(
+    retrieved_docs = await get_vector_store().asimilarity_search(query = rag_query, k = RETRIEVAL_TOP_K)
+    return retrieved_projects_update(state, retrieved_docs)
+
+def serialise_projects(docs) -> str:
+    """The uncompacted layout, kept to measure what compaction saves."""
+    return "\n\n".join(
         (f"Source : {doc.metadata}\nProject Description:{doc.page_content}")
-        for doc in retrieved_docs
+        for doc in docs
     )
+
+def retrieved_projects_update(state:State, docs, **update) -> dict:
+    docs = list(docs)
+    compacted = compact_projects(docs)
     return {
-        "retrieved_projects": serialised
+        **update,
+        "retrieved_projects": compacted,
+        "compaction_stats": {**(state.get("compaction_stats") or {}), "retrieved_projects": token_savings(serialise_projects(docs), compacted)}
     }
 
-bidder_llm = llm.with_structured_output(Proposal)
+async def search_projects(query:str):
+    """[(doc, cosine distance)] for the RETRIEVAL_TOP_K nearest past projects."""
+    return await get_vector_store().asimilarity_search_with_score(query, k = RETRIEVAL_TOP_K)
+
+def merge_search_results(*results) -> list:
+    """
+    Union of several searches, best distance per project, nearest first.
+    Both searches embed with the same model, so their distances are comparable.
+    """
+    best = {}
+    for docs in results:
+        for doc, distance in docs:
+            key = doc.id or doc.page_content
+            if key not in best or distance < best[key][1]:
+                best[key] = (doc, distance)
+    ranked = sorted(best.values(), key=lambda item: item[1])
+    return [doc for doc, _ in ranked[:RETRIEVAL_TOP_K]]
+
+async def search_with_generated_query(state:State):
+    query = (await generate_search_query(state))["rag_query"]
+    return query, await search_projects(query)
+
+async def speculative_retrieve(state:State):
+    """
+    Runs the summary search and query generation + search concurrently so the
+    query LLM is off the critical path. The LLM-query results are merged in if
+    they arrive within RETRIEVAL_QUERY_BUDGET, otherwise they are dropped.
+    """
+    summary = state.get("job_summary")
+    if not summary or summary == "N/A":
+        # Nothing to search on speculatively
+        query, docs = await search_with_generated_query(state)
+        return retrieved_projects_update(state, (doc for doc, _ in docs), rag_query=query)
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    query_search = asyncio.create_task(search_with_generated_query(state))
+    try:
+        try:
+            summary_docs = await search_projects(summary)
+        except Exception:
+            # The generated query is all we have left, so wait for it without a budget
+            query, docs = await query_search
+            return retrieved_projects_update(state, (doc for doc, _ in docs), rag_query=query)
+
+        query, query_docs = None, []
+        try:
+            budget = max(0.0, RETRIEVAL_QUERY_BUDGET - (loop.time() - started))
+            query, query_docs = await asyncio.wait_for(query_search, budget)
+        except asyncio.TimeoutError:
+            print(f"Search query not ready within {RETRIEVAL_QUERY_BUDGET}s, using summary retrieval only")
+        except Exception as e:
+            print(f"Search with generated query failed, using summary retrieval only - {e}")
+    finally:
+        if not query_search.done():
+            query_search.cancel()
+    return retrieved_projects_update(state, merge_search_results(query_docs, summary_docs), rag_query=query)
+
+# include_raw keeps the AIMessage, whose usage_metadata reports the prompt-cached input tokens
+bidder_llm = ResilientModel(
+    "generate_proposal",
+    model_targets(llm_name, LLM_FALLBACK_MODEL, output_tokens=4000, wrap=lambda model: model.with_structured_output(Proposal, include_raw=True)),
+    node_budget("generate_proposal", budget=240, hedge_delay=60),
+    is_good=lambda response: response.get("parsed") is not None
+)
+
+# Static across calls, so together with the system prompt it forms a byte-stable
+# prefix the provider can serve from its prompt cache. Everything per-job goes last.
+PROPOSAL_TASK_INSTRUCTIONS = """
+            ## Input
+            The next message holds the client's job details ("key: value" lines, empty fields omitted),
+            followed by the most relevant past projects retrieved for it, nearest first.
+"""
+
+def proposal_messages(proposal_system_prompt:str, project_details:str, retrieved_projects:str) -> list:
+    return [
+        SystemMessage(content=f"{proposal_system_prompt}\n{PROPOSAL_TASK_INSTRUCTIONS}"),
+        HumanMessage(content=f"The project details are given below:\n{project_details}\n\nThe retrieved past relevant projects are given below:\n{retrieved_projects}")
+    ]
 
-def generate_search_query(state:State):
+def proposal_call_usage(response) -> dict:
+    usage = usage_metadata(response) or {}
+    return {
+        "input_tokens": usage.get("input_tokens"),
+        "cached_input_tokens": (usage.get("input_token_details") or {}).get("cache_read", 0) if usage else None,
+        "output_tokens": usage.get("output_tokens"),
+    }
+
+# project_details -> rag_query; the key covers the prompt and model so changing either starts fresh
+rag_query_cache = PersistentLRUCache("rag_query")
+
+async def generate_search_query(state:State):
     project_details = state.get("project_details", "")
-    
+    key = content_hash(retriever_llm_name, RETRIEVAL_SYSTEM_PROMPT, project_details)
+    hit, rag_query = await rag_query_cache.get(key)
+    if hit:
+        return {
+            "rag_query":rag_query
+            }
+
     prompt = [
         SystemMessage(content=RETRIEVAL_SYSTEM_PROMPT),
         HumanMessage(content=f"The project details are given below:\n{project_details}")
     ]
-    response = retriever_llm.invoke(prompt)
+    response = await retriever_llm.ainvoke(prompt)
+    if response.content:
+        await rag_query_cache.set(key, response.content)
     return {
         "rag_query":response.content
         }
     
-def generate_proposal(state:State):
+async def generate_proposal(state:State):
     project_details = state.get("project_details", "")
     retrieved_projects = state.get("retrieved_projects", "")
     PROPOSAL_SYSTEM_PROMPT = state.get("proposal_system_prompt") or PROPOSAL_SYSTEM_PROMPT_BACKUP
-    prompt = [
-        SystemMessage(content=PROPOSAL_SYSTEM_PROMPT),
-        HumanMessage(content=f"The project details are given below:\n{project_details}\n\nThe retrieved past relevant projects are given below:\n{retrieved_projects}")
-    ]
-    response = bidder_llm.invoke(prompt)
+    prompt = proposal_messages(PROPOSAL_SYSTEM_PROMPT, project_details, retrieved_projects)
+    response = await bidder_llm.ainvoke(prompt)
     return {
-        "proposal":response
+        "proposal":response["parsed"],
+        "llm_usage":proposal_call_usage(response)
         }
 
-def build_bidder_agent()->StateGraph:
+def build_bidder_agent(speculative:bool = SPECULATIVE_RETRIEVAL)->StateGraph:
     graph_builder = StateGraph(State)
-    graph_builder.add_node(generate_search_query)
-    graph_builder.add_node(retrieve)
     graph_builder.add_node(generate_proposal)
-    graph_builder.set_entry_point("generate_search_query")
-    graph_builder.add_edge("generate_search_query", "retrieve")
-    graph_builder.add_edge("retrieve", "generate_proposal")
+    if speculative:
+        graph_builder.add_node(speculative_retrieve)
+        graph_builder.set_entry_point("speculative_retrieve")
+        graph_builder.add_edge("speculative_retrieve", "generate_proposal")
+    else:
+        graph_builder.add_node(generate_search_query)
+        graph_builder.add_node(retrieve)
+        graph_builder.set_entry_point("generate_search_query")
+        graph_builder.add_edge("generate_search_query", "retrieve")
+        graph_builder.add_edge("retrieve", "generate_proposal")
     graph_builder.set_finish_point("generate_proposal")
     graph = graph_builder.compile()
     return graph
 
-async def call_proposal_generator_agent(agent:StateGraph, project_description:str, proposal_system_prompt:str = None):
+def input_savings(stats:dict) -> dict:
+    """Input tokens saved per LLM call: the job text goes to both, retrieved projects only to the proposal call."""
+    job = stats.get("job_details", {}).get("saved", 0)
+    projects = stats.get("retrieved_projects", {}).get("saved", 0)
+    return {"generate_search_query": job, "generate_proposal": job + projects}
+
+async def call_proposal_generator_agent(agent:StateGraph, job_details:dict, proposal_system_prompt:str = None, ledger:UsageLedger = None):
+    """Returns (response, proposal, compaction_stats, llm_usage)."""
     print(proposal_system_prompt)
+    project_description = compact_job_details(job_details)
+    summary = job_details.get("summary") or ""
     initial_state:State = {
         "messages":[HumanMessage(content=f"The project details are given below:\n{project_description}")],
         "project_details":project_description,
-        "proposal_system_prompt": proposal_system_prompt
+        "job_summary": trim_to_tokens(normalize_whitespace(summary), JOB_SUMMARY_TOKEN_BUDGET) if summary else None,
+        "proposal_system_prompt": proposal_system_prompt,
+        "compaction_stats": {"job_details": token_savings(json.dumps(job_details), project_description)}
     }
-    final_state = await agent.ainvoke(initial_state)
+    final_state = await agent.ainvoke(initial_state, config={"callbacks": [ledger]} if ledger else None)
     generated_proposal =  final_state["proposal"]
+    compaction_stats = final_state.get("compaction_stats") or {}
+    compaction_stats["input_tokens_saved"] = input_savings(compaction_stats)
     
     response = {
         "llm_name": f"Hi I am {llm_name}",
@@ -257,31 +422,127 @@ async def call_proposal_generator_agent(agent:StateGraph, project_description:st
         "questions_and_answers": [{"question": qa.question, "answer": qa.answer} for qa in generated_proposal.questions_and_answers]
     }
     
-    return response, generated_proposal
-
-async def generate_proposal_for_job(state:AppState, job_url:str):
+    return response, generated_proposal, compaction_stats, final_state.get("llm_usage") or {}
+
+# One generation per (job_url, prompt version) per process; the advisory lock
+# extends that across the API and worker processes.
+proposal_flights = SingleFlight()
+
+async def generate_proposal_for_job(state:AppState, job_url:str, replace:bool = False, task_id:int = None, previous_status:str = None):
+    """
+    Generate and store a proposal for `job_url` with the active prompt; the job
+    is marked 'generated' in the same transaction as the proposal insert.
+    replace=True overwrites an existing proposal (regeneration); without it an
+    existing proposal is kept and the job goes back to `previous_status`.
+    Concurrent calls for the same job and prompt version share one generation.
+    Token usage, cost and node latency go to the llm_usage ledger under `task_id`.
+    Returns (True, message) once the proposal is stored, (False, message) otherwise.
+    """
     try:
+        # Read per call: prompt updates may come from any API process
+        proposal_system_prompt, prompt_version = await state.prompt_archive.get_active_prompt_with_version("proposal")
+        key = f"proposal:{job_url}:{prompt_version}"
+        result, shared = await proposal_flights.do(
+            key,
+            lambda: _generate_proposal_locked(state, key, job_url, proposal_system_prompt, prompt_version, replace, task_id, previous_status)
+        )
+        if shared:
+            print(f"Joined in-flight proposal generation for {job_url}")
+        return result
+    except Exception as e:
+        traceback.print_exc()
+        return False, f"Could not generate proposal for {job_url} - {e}"
+
+async def _generate_proposal_locked(state:AppState, key:str, job_url:str, proposal_system_prompt:str, prompt_version:int, replace:bool, task_id:int = None, previous_status:str = None):
+    async with advisory_lock(key) as waited:
+        exists, existing_version = await get_proposal_prompt_version(job_url)
+        if exists and not replace:
+            # Nothing new was generated, so an 'applied' or 'draft' job keeps its status
+            await reset_failed_generation(job_url, previous_status)
+            return True, f"A proposal for {job_url} already exists"
+        if waited and existing_version == prompt_version:
+            # Another process generated it with this prompt while we waited for the lock;
+            # our caller already marked the job 'processing', so set it from that proposal
+            await reset_failed_generation(job_url)
+            return True, f"Proposal for {job_url} was generated concurrently with prompt version {prompt_version}"
         job_uuid, job_details = await get_job_by_url(job_url=job_url)
         if not job_details:
-            return {"status" : "Failed", "message" : "Job details not found in database."}
+            return False, "Job details not found in database."
         job_type = job_details.get("job_type","Unknown")
-        print(f"Generating proposal for job type: {job_type}")
-        job_details = json.dumps(job_details)
-        print(f"Job Details: {job_details}")
-        if state.proposal_prompt_changed:
-            async with state.prompt_lock:
-                if state.proposal_prompt_changed:
-                    state.proposal_system_prompt = await state.prompt_archive.get_active_prompt("proposal")
-                    state.proposal_prompt_changed = False
-        try:
-            proposal, proposal_model = await call_proposal_generator_agent(state.bidder_agent, job_details, proposal_system_prompt=state.proposal_system_prompt)
-            await change_proposal_generation_status(job_url, "generated")
-        except Exception as e:
-            print(f"Error generating proposal: {e}")
-        response = await add_proposal(uuid = job_uuid,job_url=job_url, job_type=job_type, proposal = proposal_model, applied=False)
-        if response:
-            print(f"Proposal generated and stored for job {job_url}")
+        cache_key = proposal_cache_key(job_details, prompt_version, llm_name)
+        summary = job_details.get("summary", "")
+        embedding = None
+        compaction_stats = None
+        llm_usage = {}
+        source = "generated"
+        # An explicit regeneration always calls the model
+        if not replace:
+            source, cached, embedding = await lookup_proposal_cache(cache_key, job_details, summary, prompt_version)
+        if source != "generated":
+            proposal_model = Proposal.model_validate_json(cached["proposal"])
+            print(f"Reusing cached proposal ({source}) for job {job_url}")
         else:
+            print(f"Generating proposal for job type: {job_type}")
+            print(f"Job Details: {json.dumps(job_details)}")
+            ledger = UsageLedger(job_url, prompt_version, task_id)
+            try:
+                proposal, proposal_model, compaction_stats, llm_usage = await call_proposal_generator_agent(
+                    state.bidder_agent, job_details, proposal_system_prompt=proposal_system_prompt, ledger=ledger
+                )
+                print(f"Compaction saved input tokens: {compaction_stats['input_tokens_saved']}")
+                print(f"Proposal call usage: {llm_usage}")
+            except Exception as e:
+                print(f"Error generating proposal: {e}")
+                return False, f"Error generating proposal: {e}"
+            finally:
+                # Failed and cancelled runs cost money too
+                queue_llm_usage(ledger.rows())
+            embedding = embedding or await embed_job_summary(summary)
+            status, message = await add_cached_proposal(
+                cache_key, prompt_version, llm_name, questions_hash(job_details), job_type, summary, embedding, proposal_model.model_dump_json()
+            )
+            if not status:
+                print(message)
+        # A near-duplicate's proposal is only a starting point, so it goes to review as a draft
+        status, response = await store_generated_proposal(
+            uuid = job_uuid,job_url=job_url, job_type=job_type, proposal = proposal_model, prompt_version=prompt_version, replace=replace,
+            source=source, job_status="draft" if source == "cache_semantic" else "generated", compaction_stats=compaction_stats,
+            usage=llm_usage, previous_status=previous_status
+        )
+        if not status:
             print(f"Failed to store proposal for job {job_url}")
+            return False, response["message"]
+        if response["status"] == "Exists":
+            return True, f"A proposal for {job_url} already exists"
+        print(f"Proposal stored for job {job_url} ({source})")
+        return True, f"Proposal {'generated' if source == 'generated' else 'reused from cache'} for {job_url} with prompt version {prompt_version}"
+
+async def embed_job_summary(summary:str):
+    if not summary or summary == "N/A":
+        return None
+    try:
+        return await summary_embedding_model.aembed_query(summary)
     except Exception as e:
-        traceback.print_exc()
\ No newline at end of file
+        print(f"Could not embed job summary - {e}")
+        return None
+
+async def lookup_proposal_cache(cache_key:str, job_details:dict, summary:str, prompt_version:int):
+    """
+    Exact hit on the normalized input hash first, then the nearest cached job
+    summary above PROPOSAL_CACHE_SIMILARITY. Returns (source, cached_row, embedding)
+    where source is cache_exact, cache_semantic or generated (a miss); the summary
+    embedding is returned so a miss does not embed it twice.
+    """
+    hit, cached = await get_exact_cached_proposal(cache_key)
+    if hit:
+        await count_cache_event("exact_hit")
+        return "cache_exact", cached, None
+    embedding = await embed_job_summary(summary)
+    if embedding:
+        hit, cached = await get_similar_cached_proposal(embedding, prompt_version, llm_name, questions_hash(job_details))
+        if hit:
+            print(f"Near-duplicate job found (similarity {cached['similarity']:.3f})")
+            await count_cache_event("semantic_hit")
+            return "cache_semantic", cached, embedding
+    await count_cache_event("miss")
+    return "generated", None, embedding
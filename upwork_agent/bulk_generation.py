@@ -0,0 +1,63 @@
+import json
+
+from db.generation_runs import exclude_from_generation_run, finish_generation_run, record_generation_result
+from db.jobs import mark_jobs_processing, reset_failed_generation
+from db.queue_manager import enqueue_tasks
+
+GENERATE_PROPOSAL_TASK = "generate_proposal"
+BULK_GENERATION_PRIORITY = -1  # behind proposals requested one at a time from the UI
+
+def generate_proposal_task_key(job_url:str) -> str:
+    # One live generation per job, whoever asked for it
+    return f"{GENERATE_PROPOSAL_TASK}:{job_url}"
+
+async def enqueue_bulk_generation(username:str, run_id:int, jobs:list[dict]):
+    """
+    Queue one generate_proposal task per job (rows from select_jobs_for_generation)
+    tagged with `run_id`; the worker reports each result to the run row.
+    Concurrency is the worker's generate_proposal limit (TASK_CONCURRENCY).
+    Returns (True, {"enqueued": n, "coalesced": n}) or (False, error_message).
+    """
+    if not jobs:
+        await finish_generation_run(run_id, "done")
+        return True, {"enqueued": 0, "coalesced": 0}
+    specs = [
+        {
+            "task_type": GENERATE_PROPOSAL_TASK,
+            "payload": json.dumps({
+                "job_url": job["job_url"], "replace": True, "run_id": run_id,
+                "previous_status": job["proposal_generation_status"],
+            }),
+            "priority": BULK_GENERATION_PRIORITY,
+            "idempotency_key": generate_proposal_task_key(job["job_url"]),
+        }
+        for job in jobs
+    ]
+    # Marked before enqueueing so a fast worker cannot finish a job that is then flipped back to processing
+    job_urls = [job["job_url"] for job in jobs]
+    await mark_jobs_processing(job_urls)
+    status, results = await enqueue_tasks(username, specs)
+    if not status:
+        for job in jobs:
+            await reset_failed_generation(job["job_url"], job["proposal_generation_status"])
+        await finish_generation_run(run_id, "failed")
+        return False, results
+    coalesced = sum(result["coalesced"] for result in results)
+    if coalesced:
+        await exclude_from_generation_run(run_id, coalesced)
+    return True, {"enqueued": len(results) - coalesced, "coalesced": coalesced}
+
+async def release_abandoned_generations(tasks:list[dict]):
+    """
+    For generate_proposal tasks that ended without their handler finishing them
+    (cancelled while pending, dead-lettered or cancelled by the reaper): give
+    the job its previous status back and count the job as failed in its bulk run.
+    """
+    for task in tasks:
+        if task["task_type"] != GENERATE_PROPOSAL_TASK or not task["payload"]:
+            continue
+        payload = json.loads(task["payload"])
+        if payload.get("job_url"):
+            await reset_failed_generation(payload["job_url"], payload.get("previous_status"))
+        if payload.get("run_id"):
+            await record_generation_result(payload["run_id"], False)
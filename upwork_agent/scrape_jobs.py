@@ -2,11 +2,11 @@ from utils.job_counter import JobCounter
 from utils.constants import send_job_updates_webhook_url,upwork_url, home_url\
     , cloudfare_challenge_div_id, send_job_updates_webhook_url_test
 from utils.session import Session
-from utils.exceptions import ScraperError, PrivateProfileError
+from utils.exceptions import ScraperError, PrivateProfileError, TaskCancelledError
+from utils.cancellation import CancellationToken
 from utils.models import FinalJobPayload
 from utils.job_filter import JobFilter
 from db.jobs import add_job
-from db.queue_manager import update_task_status
 
 
 from nyx.page import NyxPage
@@ -26,9 +26,10 @@ class ScraperSession(Session):
             password:str, 
             security_answer:str = None,
             status_endpoint:str = send_job_updates_webhook_url,
-            job_filter = JobFilter()
+            job_filter = JobFilter(),
+            cancel_token:CancellationToken = None
         ):
-        super().__init__(task_id = task_id, page = page, username = username, password=password, security_answer=security_answer, status_endpoint=status_endpoint, payload_endpoint=status_endpoint, payload=FinalJobPayload())
+        super().__init__(task_id = task_id, page = page, username = username, password=password, security_answer=security_answer, status_endpoint=status_endpoint, payload_endpoint=status_endpoint, payload=FinalJobPayload(), cancel_token=cancel_token)
         self.links_to_visit = links_to_visit
         self.job_counter = JobCounter()
         self.latest_links = last_links
@@ -36,6 +37,10 @@ class ScraperSession(Session):
         self.job_details = {}
         self.job_filter = job_filter
         
+    async def reset_page(self):
+        await self.close_client()
+        await self.page.goto(home_url)
+
     async def run(self):
         client_setup_success = await self.setup_client()
         if not client_setup_success:
@@ -43,32 +48,44 @@ class ScraperSession(Session):
         try:
             login_success = await self.login(to_scrape=True)
             if not login_success:
-                await update_task_status(self.task_id, "failed")
                 return False
+            self.check_cancelled()
             login_page_scraper_success = await self.scrape_login_page()
             if not login_page_scraper_success:
-                await update_task_status(self.task_id, "failed")
                 return False
             for category, url in self.links_to_visit.items():
+                self.check_cancelled()
                 print(f"Visiting category: {category} - {url}")
                 job_page_visit_status = await self.visit_job_page(url)
                 if not job_page_visit_status:
                     continue
                 job_page_scrape_status = await self.scrape_listed_jobs(category)
                 if not job_page_scrape_status:
-                    await update_task_status(self.task_id, "failed")
                     return False
                 await asyncio.sleep(2)
             self.update_status("Success", f"Scraping session completed. {self.job_counter.get_count()} new jobs found.")
             # await self.send_status()
             self.print_status()
-            await update_task_status(self.task_id, "Done")
             await self.close_client()
             with open("state_data/latest_links.pkl", "wb") as f:
                 pickle.dump(self.get_latest_links(), f)
                 print("Latest links saved to latest_links.pkl")
             await self.page.goto(home_url)
             return True
+        except TaskCancelledError:
+            self.update_status("Cancelled", f"Scraping session cancelled. {self.job_counter.get_count()} new jobs found.")
+            self.print_status()
+            await self.close_client()
+            await self.page.goto(home_url)
+            raise
+        except asyncio.CancelledError:
+            # Stopped outright (worker shutdown): still hand the shared page back clean
+            print(f"{type(self).__name__} interrupted, resetting the browser page")
+            try:
+                await asyncio.shield(self.reset_page())
+            except Exception as e:
+                print(f"Error resetting the browser page: {e}")
+            raise
         except Exception as e:
             print(e)
             traceback.print_exc()
@@ -188,6 +205,7 @@ class ScraperSession(Session):
         first_link = True
         job_postings = await self.page.get_all_elements(selector='article[data-test="JobTile"]')
         for job_posting in job_postings:
+            self.check_cancelled()
             try:
                 job_posted_time_elements = await job_posting.query_selector_all('small[data-test="job-pubilshed-date"] span')
             except Exception as e:
@@ -259,6 +277,9 @@ class ScraperSession(Session):
             # await self.send_status("Failed", f"Database update error - {msg}")
             self.print_status()
             return False
+        self.job_counter.increment()
+        print(f"Job {self.job_counter.get_count()} saved - {link}")
+        return True
         # else:
         #     self.payload.status = "Done"
         #     self.payload.category = category
@@ -283,6 +304,7 @@ class ScraperSession(Session):
             job_tiles = await self.page.get_all_elements('section[data-ev-sublocation="job_feed_tile"]')
             first_link = True
             for job_posting in job_tiles:
+                self.check_cancelled()
                 job_posted_time_element = await job_posting.query_selector('span[data-test="posted-on"]')
                 job_posted_time = await self.page.get_text_content(job_posted_time_element) if job_posted_time_element else "N/A"
                 print(f"Job posted time: {job_posted_time.strip()}")
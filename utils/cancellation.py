@@ -0,0 +1,33 @@
+import asyncio
+
+from utils.exceptions import TaskCancelledError
+
+class CancellationToken:
+    """
+    Cooperative cancellation signal handed to a running task.
+    The worker calls cancel(); the task calls raise_if_cancelled() between
+    steps, at points where stopping leaves nothing half done.
+    """
+    def __init__(self, task_id: int | None = None):
+        self.task_id = task_id
+        self.reason: str | None = None
+        # Set when the worker lost the task's lease: the task lives on elsewhere,
+        # so the handler must stop without undoing or reporting anything
+        self.superseded = False
+        self._event = asyncio.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "Cancelled by user"):
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    async def wait(self):
+        await self._event.wait()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise TaskCancelledError(self.reason, context={"task_id": self.task_id})
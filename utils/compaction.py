@@ -0,0 +1,112 @@
+import json
+import os
+import re
+from functools import lru_cache
+
+import tiktoken
+
+JOB_SUMMARY_TOKEN_BUDGET = int(os.getenv("JOB_SUMMARY_TOKEN_BUDGET", "1200"))
+RETRIEVED_CONTEXT_TOKEN_BUDGET = int(os.getenv("RETRIEVED_CONTEXT_TOKEN_BUDGET", "2500"))
+MIN_PROJECT_TOKENS = 150  # a project trimmed below this is left out instead
+MIN_DEDUPE_LENGTH = 30  # only longer texts are dropped as repeats; short ones ("Hourly", "True") are legitimately shared
+
+EMPTY_VALUES = {"", "n/a", "na", "none", "null", "nan", "-"}
+LIST_FIELDS = {"skills"}
+
+CHARS_PER_TOKEN = 4  # rough estimate used when the tokenizer cannot be loaded
+
+@lru_cache(maxsize=1)
+def get_encoding():
+    """
+    The o200k_base tokenizer (gpt-5 / gpt-4o family), loaded on first use: on a
+    cold cache tiktoken downloads it, which must not break importing this module.
+    Returns None if it cannot be loaded; token counts are then estimated from length.
+    """
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        print(f"Could not load the tiktoken encoding, estimating tokens from length - {e}")
+        return None
+
+def count_tokens(text:str) -> int:
+    encoding = get_encoding()
+    if encoding is None:
+        return -(-len(text or "") // CHARS_PER_TOKEN)
+    return len(encoding.encode(text or ""))
+
+def trim_to_tokens(text:str, budget:int) -> str:
+    encoding = get_encoding()
+    if encoding is None:
+        if len(text) <= budget * CHARS_PER_TOKEN:
+            return text
+        return text[:budget * CHARS_PER_TOKEN].rstrip() + " …"
+    tokens = encoding.encode(text)
+    if len(tokens) <= budget:
+        return text
+    return encoding.decode(tokens[:budget]).rstrip() + " …"
+
+def normalize_whitespace(text:str) -> str:
+    return re.sub(r"\s+", " ", text).strip()
+
+def is_empty(value) -> bool:
+    if value is None:
+        return True
+    if isinstance(value, str):
+        return value.strip().lower() in EMPTY_VALUES
+    if isinstance(value, (list, dict)):
+        return not value
+    return False
+
+def _compact_value(key:str, value) -> str:
+    if key in LIST_FIELDS and isinstance(value, str):
+        items = [normalize_whitespace(item) for item in re.split(r"[,\n]", value)]
+        # Keep order, drop blanks and repeats
+        return ", ".join(dict.fromkeys(item for item in items if item))
+    if isinstance(value, (list, dict)):
+        return normalize_whitespace(json.dumps(value, ensure_ascii=False))
+    return normalize_whitespace(str(value))
+
+def compact_fields(fields:dict, budgets:dict[str, int] | None = None) -> str:
+    """
+    Render a dict as "key: value" lines, dropping empty/N/A fields and
+    repeated long values, collapsing whitespace and trimming fields listed in
+    `budgets` to that many tokens.
+    """
+    lines = []
+    seen = set()
+    for key, value in fields.items():
+        if is_empty(value):
+            continue
+        text = _compact_value(key, value)
+        if not text:
+            continue
+        if len(text) >= MIN_DEDUPE_LENGTH:
+            if text.lower() in seen:
+                continue
+            seen.add(text.lower())
+        if budgets and key in budgets:
+            text = trim_to_tokens(text, budgets[key])
+        lines.append(f"{key}: {text}")
+    return "\n".join(lines)
+
+def compact_job_details(job_details:dict) -> str:
+    return compact_fields(job_details, {"summary": JOB_SUMMARY_TOKEN_BUDGET})
+
+def compact_projects(docs, budget:int = RETRIEVED_CONTEXT_TOKEN_BUDGET) -> str:
+    """Retrieved projects, nearest first, until the token budget is spent; the last one may be trimmed."""
+    blocks = []
+    remaining = budget
+    for doc in docs:
+        block = compact_fields({**doc.metadata, "Project Description": doc.page_content})
+        tokens = count_tokens(block)
+        if tokens > remaining:
+            if remaining < MIN_PROJECT_TOKENS:
+                break
+            block, tokens = trim_to_tokens(block, remaining), remaining
+        blocks.append(block)
+        remaining -= tokens
+    return "\n\n".join(f"Project {i}:\n{block}" for i, block in enumerate(blocks, 1))
+
+def token_savings(before:str, after:str) -> dict:
+    before_tokens, after_tokens = count_tokens(before), count_tokens(after)
+    return {"before": before_tokens, "after": after_tokens, "saved": before_tokens - after_tokens}
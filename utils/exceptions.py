@@ -38,4 +38,67 @@ class LoginPageNotFound(ScraperError):
     """Raised when the login / expected page is not found."""
     def __init__(self, message: str | None = None, code: int | None = None, context: dict | None = None):
         default = "Login page not found or page structure changed."
-        super().__init__(message or default, code=code or 404, context=context)
\ No newline at end of file
+        super().__init__(message or default, code=code or 404, context=context)
+
+
+class TaskFailedError(Exception):
+    """Raised by a task handler when the task did not succeed and should be retried.
+
+    Parameters
+    ----------
+    message : str | None
+        Reason for the failure, stored as the task's error.
+    context : dict | None
+        Optional dict with additional context (e.g. {'task_id': task_id}).
+    """
+    def __init__(self, message: str | None = None, context: dict | None = None):
+        self.message = message or "Task failed."
+        self.context = context
+        super().__init__(self.message)
+
+
+class TaskCancelledError(Exception):
+    """Raised inside a task handler once cancellation of its task has been requested.
+
+    Parameters
+    ----------
+    message : str | None
+        Reason for the cancellation, stored as the task's result message.
+    context : dict | None
+        Optional dict with additional context (e.g. {'task_id': task_id}).
+    """
+    def __init__(self, message: str | None = None, context: dict | None = None):
+        self.message = message or "Task cancelled."
+        self.context = context
+        super().__init__(self.message)
+
+
+class LLMUnavailableError(Exception):
+    """Raised when no model produced a usable response within the node's latency budget.
+
+    Parameters
+    ----------
+    message : str | None
+        Reason the call failed (last error, timeout or open circuit).
+    context : dict | None
+        Optional dict with additional context (e.g. {'node': 'generate_proposal'}).
+    """
+    def __init__(self, message: str | None = None, context: dict | None = None):
+        self.message = message or "No model response within the latency budget."
+        self.context = context
+        super().__init__(self.message)
+
+class UnusableResponseError(Exception):
+    """Raised when a model answered but the response cannot be used (e.g. a failed structured-output parse).
+
+    Parameters
+    ----------
+    message : str | None
+        What was wrong with the response.
+    context : dict | None
+        Optional dict with additional context (e.g. {'target': 'gpt-4o-mini'}).
+    """
+    def __init__(self, message: str | None = None, context: dict | None = None):
+        self.message = message or "Model returned an unusable response."
+        self.context = context
+        super().__init__(self.message)
@@ -0,0 +1,181 @@
+import asyncio
+import os
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from langchain_core.runnables import Runnable
+
+from utils.exceptions import LLMUnavailableError, UnusableResponseError
+
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "2"))  # extra rounds after the first, within the budget
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "1"))
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))  # consecutive failures before opening
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "60"))  # seconds open before a trial request
+
+@dataclass
+class NodeBudget:
+    """Latency budget (seconds) for one graph node and when to send the hedge request."""
+    budget: float
+    hedge_delay: float | None
+
+def node_budget(node: str, budget: float, hedge_delay: float | None) -> NodeBudget:
+    """Defaults overridable per node, e.g. LLM_BUDGET_GENERATE_PROPOSAL / LLM_HEDGE_DELAY_GENERATE_PROPOSAL (0 disables hedging)."""
+    name = node.upper()
+    budget = float(os.getenv(f"LLM_BUDGET_{name}", budget))
+    hedge = os.getenv(f"LLM_HEDGE_DELAY_{name}")
+    if hedge is not None:
+        hedge_delay = float(hedge) or None
+    return NodeBudget(budget, hedge_delay)
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures; while open the target is skipped.
+    After `reset_timeout` one trial request is let through (half-open) and its
+    outcome closes or re-opens the circuit.
+    """
+    def __init__(self, name: str, threshold: int = LLM_BREAKER_THRESHOLD, reset_timeout: float = LLM_BREAKER_RESET):
+        self.name = name
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.threshold:
+            if self.opened_at is None:
+                print(f"Circuit for {self.name} opened after {self.failures} failures")
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """A cancelled (hedged-out) request says nothing about the target's health."""
+        self.trial_in_flight = False
+
+@dataclass
+class ModelTarget:
+    name: str
+    runnable: Runnable
+    breaker: CircuitBreaker
+
+class ResilientModel:
+    """
+    ainvoke() over a primary and alternate model targets (another model, or the
+    same one on a replica base_url):
+      - the whole call, retries included, must finish within the node budget;
+      - if the primary has not answered after hedge_delay, the next target is
+        raised in parallel and the first good response wins, the rest are cancelled;
+      - failed rounds are retried with jittered backoff while budget remains;
+      - targets whose circuit is open are skipped.
+    `is_good` rejects responses that came back but are unusable (e.g. empty text);
+    those are retried like failures but do not count against the target's circuit.
+    """
+    def __init__(self, node: str, targets: list[ModelTarget], budget: NodeBudget, is_good: Callable[[Any], bool] | None = None):
+        self.node = node
+        self.targets = targets
+        self.budget = budget
+        self.is_good = is_good or (lambda response: response is not None)
+
+    async def _call(self, target: ModelTarget, messages):
+        response = await target.runnable.ainvoke(messages)
+        if not self.is_good(response):
+            raise UnusableResponseError(f"{target.name} returned an unusable response", context={"target": target.name})
+        return response
+
+    async def _round(self, messages, deadline: float):
+        """One hedged round. Returns the winning response or raises the last error."""
+        loop = asyncio.get_running_loop()
+        candidates = list(self.targets)
+        pending: dict[asyncio.Task, ModelTarget] = {}
+        last_error: Exception | None = None
+
+        def launch():
+            while candidates:
+                target = candidates.pop(0)
+                if target.breaker.allow():
+                    pending[asyncio.create_task(self._call(target, messages))] = target
+                    return
+
+        try:
+            launch()
+            if not pending:
+                raise LLMUnavailableError(f"All model circuits are open for {self.node}", context={"node": self.node})
+            while pending:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                hedge_delay = self.budget.hedge_delay if candidates else None
+                timeout = min(remaining, hedge_delay) if hedge_delay else remaining
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    target = pending.pop(task)
+                    if task.exception() is None:
+                        target.breaker.record_success()
+                        if target is not self.targets[0]:
+                            print(f"{self.node}: answered by {target.name}")
+                        return task.result()
+                    last_error = task.exception()
+                    if isinstance(last_error, UnusableResponseError):
+                        # The endpoint answered; bad output is no reason to open its circuit
+                        target.breaker.release()
+                    else:
+                        target.breaker.record_failure()
+                    print(f"{self.node}: {target.name} failed - {last_error}")
+                # Hedge once the delay has passed, fail over at once if everything in flight failed
+                if (not done and hedge_delay) or not pending:
+                    launch()
+            raise last_error
+        finally:
+            for task, target in pending.items():
+                task.cancel()
+                target.breaker.release()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def ainvoke(self, messages):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.budget.budget
+        last_error: Exception | None = None
+        for attempt in range(LLM_RETRIES + 1):
+            try:
+                return await self._round(messages, deadline)
+            except asyncio.TimeoutError:
+                last_error = None
+                break
+            except LLMUnavailableError:
+                raise
+            except Exception as e:
+                last_error = e
+            delay = random.uniform(0, LLM_RETRY_BASE_DELAY * 2 ** attempt)
+            if loop.time() + delay >= deadline:
+                break
+            await asyncio.sleep(delay)
+        reason = f"last error: {last_error}" if last_error else f"no response within {self.budget.budget}s"
+        raise LLMUnavailableError(f"{self.node} failed ({reason})", context={"node": self.node})
+
+    def breaker_states(self) -> dict:
+        return {t.name: {"state": t.breaker.state, "failures": t.breaker.failures} for t in self.targets}
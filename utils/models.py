@@ -22,8 +22,11 @@ class State(TypedDict):
     rag_query:Optional[str]
     proposal:Optional[Proposal]
     project_details:Optional[str]
+    job_summary:Optional[str]
     retrieved_projects:Optional[str]
     proposal_system_prompt:Optional[str]
+    compaction_stats:Optional[dict]
+    llm_usage:Optional[dict]
     
 class FinalJobPayload(BaseModel):
     status: str = Field("", description="status")
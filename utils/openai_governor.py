@@ -0,0 +1,178 @@
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+
+OPENAI_RPM = int(os.getenv("OPENAI_RPM", "500"))  # per process
+OPENAI_TPM = int(os.getenv("OPENAI_TPM", "200000"))
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "16"))
+OPENAI_MIN_CONCURRENCY = int(os.getenv("OPENAI_MIN_CONCURRENCY", "1"))
+RATE_LIMIT_BACKOFF = float(os.getenv("OPENAI_RATE_LIMIT_BACKOFF", "5"))  # pause after a 429 without Retry-After
+DECREASE_COOLDOWN = 2.0  # a burst of 429s from one overload halves the limit once
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+# Set by callers doing batch work; tasks spawned inside inherit it
+llm_priority: ContextVar[int] = ContextVar("llm_priority", default=INTERACTIVE)
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+def is_rate_limit(error: Exception) -> bool:
+    return getattr(error, "status_code", None) == 429 or type(error).__name__ == "RateLimitError"
+
+def retry_after(error: Exception) -> float:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after", RATE_LIMIT_BACKOFF))
+    except (TypeError, ValueError):
+        return RATE_LIMIT_BACKOFF
+
+class TokenBucket:
+    """Continuously refilled bucket holding at most one minute's worth of `per_minute`."""
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def take(self, amount: float):
+        amount = min(amount, self.capacity)
+        while True:
+            self._refill()
+            if self.level >= amount:
+                self.level -= amount
+                return
+            await asyncio.sleep((amount - self.level) / self.rate)
+
+    def adjust(self, delta: float):
+        """Correct an earlier estimate once the real usage is known (may go into debt)."""
+        self._refill()
+        self.level = min(self.capacity, self.level - delta)
+
+class OpenAIGovernor:
+    """
+    Process-wide admission control for OpenAI calls: requests-per-minute and
+    tokens-per-minute buckets plus a concurrency limit adjusted by AIMD -
+    +1/limit per success, halved on a rate-limit response, which also pauses
+    new requests for Retry-After. Waiting callers are admitted by priority
+    (INTERACTIVE before BACKGROUND), then in arrival order.
+    """
+    def __init__(self, rpm: int = OPENAI_RPM, tpm: int = OPENAI_TPM, max_concurrency: int = OPENAI_MAX_CONCURRENCY, min_concurrency: int = OPENAI_MIN_CONCURRENCY):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.waiters: list[tuple[int, int, asyncio.Future]] = []
+        self.sequence = itertools.count()
+        self.resume_at = 0.0
+        self.last_decrease = 0.0
+        self.rate_limited = 0
+
+    def _admit_waiters(self):
+        while self.waiters and self.in_flight < int(self.limit):
+            _, _, future = heapq.heappop(self.waiters)
+            if future.done():
+                continue
+            self.in_flight += 1
+            future.set_result(None)
+
+    async def _acquire_slot(self, priority: int):
+        if self.in_flight < int(self.limit) and not self.waiters:
+            self.in_flight += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, (priority, next(self.sequence), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Admitted just as we were cancelled - hand the slot on
+                self._release_slot()
+            raise
+
+    def _release_slot(self):
+        self.in_flight -= 1
+        self._admit_waiters()
+
+    def on_success(self):
+        self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+        self._admit_waiters()
+
+    def on_rate_limit(self, pause: float):
+        self.rate_limited += 1
+        now = time.monotonic()
+        self.resume_at = max(self.resume_at, now + pause)
+        if now - self.last_decrease >= DECREASE_COOLDOWN:
+            self.last_decrease = now
+            self.limit = max(self.min_concurrency, self.limit / 2)
+            print(f"OpenAI rate limited - concurrency limit now {int(self.limit)}, pausing {pause:.1f}s")
+
+    @asynccontextmanager
+    async def slot(self, tokens: int, priority: int | None = None):
+        """Hold one admitted request. Yields a callback to report the actual token usage."""
+        await self._acquire_slot(llm_priority.get() if priority is None else priority)
+        try:
+            pause = self.resume_at - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            await self.requests.take(1)
+            await self.tokens.take(tokens)
+            try:
+                yield lambda used: self.tokens.adjust(used - tokens)
+            except Exception as e:
+                if is_rate_limit(e):
+                    self.on_rate_limit(retry_after(e))
+                raise
+            self.on_success()
+        finally:
+            self._release_slot()
+
+    def stats(self) -> dict:
+        return {
+            "concurrency_limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "waiting": sum(1 for _, _, future in self.waiters if not future.done()),
+            "requests_available": int(self.requests.level),
+            "tokens_available": int(self.tokens.level),
+            "rate_limited": self.rate_limited,
+        }
+
+governor = OpenAIGovernor()
+
+def usage_metadata(response) -> dict | None:
+    """usage_metadata of an AIMessage, or of the raw message of an include_raw structured output."""
+    if isinstance(response, dict):
+        response = response.get("raw")
+    return getattr(response, "usage_metadata", None)
+
+class GovernedModel:
+    """
+    Chat model (or structured-output runnable) whose ainvoke goes through the
+    governor. `output_tokens` is reserved up front alongside the prompt estimate
+    and corrected from usage_metadata when the response carries it.
+    """
+    def __init__(self, runnable, output_tokens: int):
+        self.runnable = runnable
+        self.output_tokens = output_tokens
+
+    async def ainvoke(self, messages, **kwargs):
+        prompt = "".join(str(getattr(m, "content", m)) for m in messages)
+        async with governor.slot(estimate_tokens(prompt) + self.output_tokens) as report_usage:
+            response = await self.runnable.ainvoke(messages, **kwargs)
+            usage = usage_metadata(response)
+            if usage:
+                report_usage(usage.get("total_tokens", 0))
+            return response
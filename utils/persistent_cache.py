@@ -0,0 +1,57 @@
+import hashlib
+import os
+from collections import OrderedDict
+
+from db.llm_cache import get_llm_cache, set_llm_cache
+
+LLM_CACHE_MEMORY_ITEMS = int(os.getenv("LLM_CACHE_MEMORY_ITEMS", "1024"))  # per cache, per process
+
+def content_hash(*parts:str) -> str:
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+class PersistentLRUCache:
+    """
+    In-memory LRU in front of the llm_cache table. Misses in memory fall through
+    to Postgres, so every process (and restarts) share what was computed before.
+    The table is size-bounded separately by trim_llm_cache.
+    """
+    def __init__(self, kind: str, maxsize: int = LLM_CACHE_MEMORY_ITEMS):
+        self.kind = kind
+        self.maxsize = maxsize
+        self.items: OrderedDict[str, object] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_local(self, key: str):
+        if key in self.items:
+            self.items.move_to_end(key)
+            return True, self.items[key]
+        return False, None
+
+    def set_local(self, key: str, value):
+        self.items[key] = value
+        self.items.move_to_end(key)
+        while len(self.items) > self.maxsize:
+            self.items.popitem(last=False)
+
+    async def get(self, key: str):
+        """Returns (True, value) on a hit, (False, None) on a miss."""
+        hit, value = self.get_local(key)
+        if not hit:
+            hit, value = await get_llm_cache(self.kind, key)
+            if hit:
+                self.set_local(key, value)
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return hit, value
+
+    async def set(self, key: str, value):
+        self.set_local(key, value)
+        status, message = await set_llm_cache(self.kind, key, value)
+        if not status:
+            print(message)
+
+    def stats(self) -> dict:
+        return {"kind": self.kind, "in_memory": len(self.items), "hits": self.hits, "misses": self.misses}
@@ -171,6 +171,16 @@ class PromptArchive:
             )
             return record["prompt_text"] if record else self.get_proposal_prompt_backup()
 
+    async def get_active_prompt_with_version(self, prompt_name: str) -> tuple[str, int]:
+        """Active prompt text and its version; version 0 is the built-in backup prompt."""
+        async with self.pool.acquire() as conn:
+            record = await conn.fetchrow(
+                "SELECT prompt_text, version FROM prompts WHERE prompt_name=$1 AND is_active=TRUE", prompt_name
+            )
+            if record:
+                return record["prompt_text"], record["version"]
+            return self.get_proposal_prompt_backup(), 0
+
     async def rollback(self, prompt_name: str, version: int):
         async with self.pool.acquire() as conn:
             async with conn.transaction():
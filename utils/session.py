@@ -1,4 +1,5 @@
 from utils.constants import upwork_login_url, cloudfare_challenge_div_id, upwork_url, home_url
+from utils.cancellation import CancellationToken
 
 from nyx.page import NyxPage
 
@@ -7,7 +8,7 @@ from pydantic import BaseModel
 import asyncio
 
 class Session:
-    def __init__(self, task_id:int, page:NyxPage, username: str, password: str, security_answer: str = None, status_endpoint:str = None, payload_endpoint:str = None, payload:BaseModel = None):
+    def __init__(self, task_id:int, page:NyxPage, username: str, password: str, security_answer: str = None, status_endpoint:str = None, payload_endpoint:str = None, payload:BaseModel = None, cancel_token:CancellationToken = None):
         self.task_id = task_id
         self.username = username
         self.password = password
@@ -18,6 +19,12 @@ class Session:
         self.status_endpoint = status_endpoint
         self.payload_endpoint = payload_endpoint
         self.status = {}
+        self.cancel_token = cancel_token
+    
+    def check_cancelled(self):
+        """Raise TaskCancelledError if the task running this session was cancelled. Call between steps."""
+        if self.cancel_token:
+            self.cancel_token.raise_if_cancelled()
     
     async def setup_client(self):
         try:
@@ -0,0 +1,45 @@
+import asyncio
+from typing import Awaitable, Callable
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one: the first caller runs
+    the coroutine, later callers await its result instead of starting their own.
+    Nothing is cached once the call finishes. If the leading call is cancelled,
+    a waiting caller takes over and runs it again.
+    """
+    def __init__(self):
+        self.calls: dict[str, asyncio.Future] = {}
+
+    def in_flight(self, key: str) -> bool:
+        return key in self.calls
+
+    async def do(self, key: str, fn: Callable[[], Awaitable]):
+        """Returns (result, shared) where shared is True for callers that joined another call."""
+        while True:
+            future = self.calls.get(key)
+            if future is None:
+                break
+            try:
+                return await asyncio.shield(future), True
+            except asyncio.CancelledError:
+                if future.cancelled() and not asyncio.current_task().cancelling():
+                    continue
+                raise
+
+        future = asyncio.get_running_loop().create_future()
+        self.calls[key] = future
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # retrieved here so an unjoined failure is not logged again
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            self.calls.pop(key, None)
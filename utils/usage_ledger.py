@@ -0,0 +1,107 @@
+import asyncio
+import json
+import os
+import time
+from uuid import UUID
+
+from langchain_core.callbacks import AsyncCallbackHandler
+
+# USD per 1M tokens as (input, cached input, output). LLM_PRICES='{"model": [in, cached, out]}' overrides or adds models.
+DEFAULT_MODEL_PRICES = {
+    "gpt-5": (1.25, 0.125, 10.0),
+    "gpt-5-mini": (0.25, 0.025, 2.0),
+    "gpt-5-nano": (0.05, 0.005, 0.40),
+}
+MODEL_PRICES = {**DEFAULT_MODEL_PRICES, **{k: tuple(v) for k, v in json.loads(os.getenv("LLM_PRICES", "{}")).items()}}
+
+def model_prices(model:str | None):
+    if not model:
+        return None
+    model = model.split(":")[-1]
+    if model in MODEL_PRICES:
+        return MODEL_PRICES[model]
+    # Dated snapshots, e.g. gpt-5-2025-08-07, are priced like their base model
+    matches = [name for name in MODEL_PRICES if model.startswith(name)]
+    return MODEL_PRICES[max(matches, key=len)] if matches else None
+
+def model_cost(model:str | None, input_tokens:int, cached_input_tokens:int, output_tokens:int) -> float:
+    prices = model_prices(model)
+    if not prices:
+        return 0.0
+    input_price, cached_price, output_price = prices
+    return ((input_tokens - cached_input_tokens) * input_price + cached_input_tokens * cached_price + output_tokens * output_price) / 1_000_000
+
+class UsageLedger(AsyncCallbackHandler):
+    """
+    Callback for one bidder graph run. Aggregates, per graph node, the chat
+    model calls made inside it (tokens, cost, failed attempts) and the node's
+    wall-clock latency. Attempts made by ResilientModel inherit the node's
+    run config, so hedges and retries are attributed to the right node.
+    rows() gives the llm_usage rows once the run is over.
+    """
+    def __init__(self, job_url:str | None = None, prompt_version:int | None = None, task_id:int | None = None):
+        self.job_url = job_url
+        self.prompt_version = prompt_version
+        self.task_id = task_id
+        self.nodes: dict[str, dict] = {}
+        self.node_runs: dict[UUID, tuple[str, float]] = {}
+        self.llm_runs: dict[UUID, tuple[str, str | None]] = {}
+
+    def _entry(self, node:str) -> dict:
+        return self.nodes.setdefault(node, {
+            "node": node, "model": None, "calls": 0, "retries": 0,
+            "input_tokens": 0, "cached_input_tokens": 0, "output_tokens": 0,
+            "latency_ms": None, "cost_usd": 0.0,
+        })
+
+    async def on_chain_start(self, serialized, inputs, *, run_id:UUID, metadata:dict | None = None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        # Runnables inside a node carry the same metadata; the node's own run is named after it
+        if node and kwargs.get("name") == node:
+            self.node_runs[run_id] = (node, time.monotonic())
+
+    def _end_node(self, run_id:UUID):
+        if run_id not in self.node_runs:
+            return
+        node, started = self.node_runs.pop(run_id)
+        entry = self._entry(node)
+        entry["latency_ms"] = (entry["latency_ms"] or 0) + int((time.monotonic() - started) * 1000)
+
+    async def on_chain_end(self, outputs, *, run_id:UUID, **kwargs):
+        self._end_node(run_id)
+
+    async def on_chain_error(self, error, *, run_id:UUID, **kwargs):
+        self._end_node(run_id)
+
+    async def on_chat_model_start(self, serialized, messages, *, run_id:UUID, metadata:dict | None = None, **kwargs):
+        metadata = metadata or {}
+        self.llm_runs[run_id] = (metadata.get("langgraph_node", "unknown"), metadata.get("ls_model_name"))
+
+    async def on_llm_end(self, response, *, run_id:UUID, **kwargs):
+        node, model = self.llm_runs.pop(run_id, ("unknown", None))
+        entry = self._entry(node)
+        entry["calls"] += 1
+        entry["model"] = model
+        generation = response.generations[0][0] if response.generations and response.generations[0] else None
+        usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+        input_tokens = usage.get("input_tokens", 0)
+        cached_input_tokens = (usage.get("input_token_details") or {}).get("cache_read", 0) or 0
+        output_tokens = usage.get("output_tokens", 0)
+        entry["input_tokens"] += input_tokens
+        entry["cached_input_tokens"] += cached_input_tokens
+        entry["output_tokens"] += output_tokens
+        entry["cost_usd"] += model_cost(model, input_tokens, cached_input_tokens, output_tokens)
+
+    async def on_llm_error(self, error, *, run_id:UUID, **kwargs):
+        node, model = self.llm_runs.pop(run_id, ("unknown", None))
+        entry = self._entry(node)
+        entry["calls"] += 1
+        # A hedge cancelled because the other request won is not a retry
+        if not isinstance(error, asyncio.CancelledError):
+            entry["retries"] += 1
+
+    def rows(self) -> list[dict]:
+        return [
+            {**entry, "job_url": self.job_url, "prompt_version": self.prompt_version, "task_id": self.task_id, "cost_usd": round(entry["cost_usd"], 6)}
+            for entry in self.nodes.values()
+        ]
@@ -0,0 +1,4 @@
+from worker.lease import TaskLease, make_worker_id
+from worker.maintenance import reaper_loop, archiver_loop, cache_eviction_loop, usage_flush_loop
+from worker.supervisor import WorkerSupervisor
+from worker.scheduler import scheduler_loop
@@ -0,0 +1,10 @@
+import asyncio
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from worker.runner import run_worker
+
+if __name__ == "__main__":
+    asyncio.run(run_worker())
@@ -0,0 +1,73 @@
+import asyncio
+import os
+import socket
+import uuid
+
+from db.queue_manager import extend_task_lease, DEFAULT_LEASE_SECONDS
+from utils.cancellation import CancellationToken
+
+TASK_LEASE_SECONDS = int(os.getenv("TASK_LEASE_SECONDS", DEFAULT_LEASE_SECONDS))
+LEASE_RETRY_SECONDS = 5  # between heartbeat attempts after a failed one
+
+def make_worker_id() -> str:
+    """Unique per process, readable enough to tell which host/pid holds a task."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+class TaskLease:
+    """
+    Async context manager that heartbeats a claimed task while its handler runs.
+    The lease is extended every third of its length, so a single missed beat
+    does not let the reaper steal a task that is still alive.
+    Each beat also picks up a cancellation request for the task, in case the
+    NOTIFY on the cancel channel was missed.
+    A failed beat is retried sooner; once the lease is confirmed lost, or could
+    not be renewed before it ran out, the handler is cancelled through the
+    token, since the reaper hands the task to another worker.
+    """
+    def __init__(self, task_id:int, worker_id:str, lease_seconds:int = TASK_LEASE_SECONDS):
+        self.task_id = task_id
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.lost = False
+        self.cancel_token = CancellationToken(task_id)
+        self._heartbeat_task: asyncio.Task | None = None
+
+    async def __aenter__(self):
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._heartbeat_task.cancel()
+        try:
+            await self._heartbeat_task
+        except asyncio.CancelledError:
+            pass
+        return False
+
+    def _lose(self, reason:str):
+        self.lost = True
+        self.cancel_token.superseded = True
+        print(f"Task {self.task_id}: {reason}")
+        self.cancel_token.cancel(reason)
+
+    async def _heartbeat(self):
+        loop = asyncio.get_running_loop()
+        renewed_at = loop.time()
+        interval = self.lease_seconds / 3
+        while True:
+            await asyncio.sleep(interval)
+            status, result = await extend_task_lease(self.task_id, self.worker_id, self.lease_seconds)
+            if not status:
+                print(result)
+                if loop.time() - renewed_at >= self.lease_seconds:
+                    self._lose("Lease expired while the heartbeat was failing")
+                    return
+                interval = min(self.lease_seconds / 3, LEASE_RETRY_SECONDS)
+                continue
+            if not result["held"]:
+                self._lose(f"Lease is no longer held by {self.worker_id}")
+                return
+            renewed_at = loop.time()
+            interval = self.lease_seconds / 3
+            if result["cancel_requested"]:
+                self.cancel_token.cancel()
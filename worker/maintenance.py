@@ -0,0 +1,95 @@
+import asyncio
+import os
+import traceback
+
+from db.queue_manager import requeue_expired_tasks, archive_finished_tasks
+from db.proposal_cache import evict_cached_proposals
+from db.llm_cache import trim_llm_cache
+from db.llm_usage import flush_llm_usage
+from upwork_agent.bulk_generation import release_abandoned_generations
+
+REAPER_INTERVAL = int(os.getenv("REAPER_INTERVAL", "30"))
+ARCHIVE_INTERVAL = int(os.getenv("ARCHIVE_INTERVAL", "300"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+TASK_HISTORY_RETENTION = int(os.getenv("TASK_HISTORY_RETENTION", "3600"))  # seconds finished tasks stay in task_queue
+CACHE_EVICTION_INTERVAL = int(os.getenv("CACHE_EVICTION_INTERVAL", "3600"))
+LLM_USAGE_FLUSH_INTERVAL = int(os.getenv("LLM_USAGE_FLUSH_INTERVAL", "10"))
+
+async def reaper_loop(interval:int = REAPER_INTERVAL):
+    """Periodically requeue tasks whose worker stopped heartbeating."""
+    while True:
+        try:
+            status, result = await requeue_expired_tasks()
+            if not status:
+                print(result)
+            elif result["requeued"] or result["dead"] or result["cancelled"]:
+                print(result["message"])
+                await release_abandoned_generations(result["abandoned"])
+        except Exception as e:
+            print(f"Error in reaper loop: {e}")
+            traceback.print_exc()
+        await asyncio.sleep(interval)
+
+async def archiver_loop(interval:int = ARCHIVE_INTERVAL, batch_size:int = ARCHIVE_BATCH_SIZE):
+    """
+    Periodically move finished tasks into task_queue_history.
+    Works in small batches so each DELETE holds its locks only briefly.
+    """
+    while True:
+        try:
+            total = 0
+            while True:
+                status, moved = await archive_finished_tasks(batch_size, TASK_HISTORY_RETENTION)
+                if not status:
+                    print(moved)
+                    break
+                total += moved
+                if moved < batch_size:
+                    break
+                await asyncio.sleep(0.5)
+            if total:
+                print(f"Archived {total} finished tasks to task_queue_history")
+        except Exception as e:
+            print(f"Error in archiver loop: {e}")
+            traceback.print_exc()
+        await asyncio.sleep(interval)
+
+async def cache_eviction_loop(interval:int = CACHE_EVICTION_INTERVAL):
+    """
+    Periodically drop proposal cache entries older than PROPOSAL_CACHE_MAX_AGE
+    and trim the query/embedding cache to LLM_CACHE_MAX_ROWS per kind.
+    """
+    while True:
+        try:
+            status, evicted = await evict_cached_proposals()
+            if not status:
+                print(evicted)
+            elif evicted:
+                print(f"Evicted {evicted} cached proposals")
+            status, trimmed = await trim_llm_cache()
+            if not status:
+                print(trimmed)
+            elif trimmed:
+                print(f"Trimmed {trimmed} LLM cache entries")
+        except Exception as e:
+            print(f"Error in cache eviction loop: {e}")
+            traceback.print_exc()
+        await asyncio.sleep(interval)
+
+async def usage_flush_loop(interval:int = LLM_USAGE_FLUSH_INTERVAL):
+    """Write the buffered llm_usage rows in batches; flushes once more on shutdown."""
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                status, written = await flush_llm_usage()
+                if not status:
+                    print(written)
+            except Exception as e:
+                print(f"Error in usage flush loop: {e}")
+                traceback.print_exc()
+    except asyncio.CancelledError:
+        status, written = await flush_llm_usage()
+        if not status:
+            print(written)
+        raise
@@ -0,0 +1,85 @@
+import asyncio
+import signal
+import traceback
+
+from nyx.browser import NyxBrowser
+from nyx.page import NyxPage
+
+from db.pool import init_pool, close_pool
+from db.queue_manager import requeue_expired_tasks
+from rag_utils.embed_data import check_embeddings_exist, embed_documents, create_docs_from_csv, ensure_pgvector
+from state import AppState
+from upwork_agent.bidder_agent import build_bidder_agent
+from utils.prompts_archive import PromptArchive
+from utils import generate_search_links
+from worker.lease import make_worker_id
+from worker.maintenance import reaper_loop, archiver_loop, cache_eviction_loop, usage_flush_loop
+from worker.scheduler import scheduler_loop
+from worker.tasks import build_worker_supervisor, load_latest_urls
+
+async def run_worker():
+    """
+    Standalone worker process: owns the browser and consumes task_queue.
+    API processes only talk to it through the database.
+    """
+    state:AppState = AppState()
+    worker_id = make_worker_id()
+    browser:NyxBrowser = NyxBrowser()
+    await browser.start()
+    state.browser = browser
+    print("Browser started")
+    state.filter_urls = generate_search_links()
+    state.latest_urls = load_latest_urls()
+    page:NyxPage = await state.browser.new_page()
+    state.page = page
+    await init_pool()
+    print("Database pool initialized")
+    await ensure_pgvector()
+    if not check_embeddings_exist():
+        await embed_documents(create_docs_from_csv("data/proposals.csv"))
+    state.prompt_archive = PromptArchive()
+    await state.prompt_archive.init()
+    state.bidder_agent = build_bidder_agent()
+    print("Bidder agent created")
+    requeue_status, result = await requeue_expired_tasks()
+    print(requeue_status, result)
+
+    state.worker_supervisor = build_worker_supervisor(state, worker_id)
+    background = [
+        asyncio.create_task(state.worker_supervisor.run()),
+        asyncio.create_task(reaper_loop()),
+        asyncio.create_task(archiver_loop()),
+        asyncio.create_task(scheduler_loop()),
+        asyncio.create_task(cache_eviction_loop()),
+        asyncio.create_task(usage_flush_loop()),
+    ]
+    state.worker_task = background[0]
+    print(f"Worker supervisor started as {worker_id}")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        done_waiter = asyncio.create_task(stop.wait())
+        done, _ = await asyncio.wait([done_waiter, *background], return_when=asyncio.FIRST_COMPLETED)
+        for finished in done:
+            if finished is not done_waiter and finished.exception():
+                print(f"Worker background task crashed: {finished.exception()}")
+        done_waiter.cancel()
+    finally:
+        print("Shutting down worker")
+        # Stop the supervisor (and its handlers) first: cancelled generations still queue
+        # their usage rows, which the flush loop must be alive to write on its way out.
+        supervisor_task, *loops = background
+        supervisor_task.cancel()
+        await asyncio.gather(supervisor_task, return_exceptions=True)
+        for task in loops:
+            task.cancel()
+        await asyncio.gather(*loops, return_exceptions=True)
+        try:
+            await close_pool()
+            print("Database pool closed")
+            await state.browser.shutdown()
+        except Exception:
+            traceback.print_exc()
@@ -0,0 +1,21 @@
+import asyncio
+import os
+import traceback
+
+from db.recurring_tasks import materialize_due_recurring_tasks
+
+SCHEDULER_TICK = int(os.getenv("SCHEDULER_TICK", "15"))
+
+async def scheduler_loop(interval:int = SCHEDULER_TICK):
+    """Turn due recurring_tasks into task_queue rows once per tick."""
+    while True:
+        try:
+            status, result = await materialize_due_recurring_tasks()
+            if not status:
+                print(result)
+            elif result["enqueued"] or result.get("coalesced"):
+                print(result["message"])
+        except Exception as e:
+            print(f"Error in scheduler loop: {e}")
+            traceback.print_exc()
+        await asyncio.sleep(interval)
@@ -0,0 +1,241 @@
+import asyncio
+import os
+import traceback
+from collections import defaultdict
+from typing import Awaitable, Callable
+
+from db.queue_manager import get_next_task, complete_task, fail_task, get_next_run_in, TASK_QUEUE_CHANNEL, TASK_CANCEL_CHANNEL
+from db.queue_listener import QueueListener, TaskEventBroadcaster
+from utils.cancellation import CancellationToken
+from utils.exceptions import TaskCancelledError
+from worker.lease import TaskLease
+
+QUEUE_POLL_INTERVAL = int(os.getenv("QUEUE_POLL_INTERVAL", "30"))  # fallback poll while LISTEN is down
+WORKER_CONSUMERS = int(os.getenv("WORKER_CONSUMERS", "5"))  # max tasks in flight across all types
+CANCEL_GRACE_SECONDS = int(os.getenv("TASK_CANCEL_GRACE_SECONDS", "30"))  # then a cancelled handler is stopped outright
+NO_HARD_CANCEL_GROUPS = {"browser"}  # handlers that must put the shared page back themselves
+CANCEL_LISTEN_RETRY = 30  # seconds between reconnect attempts of the cancel channel
+
+# Limits are keyed by concurrency group. A task type is its own group unless it
+# is registered with a shared one - every browser-bound type shares "browser"
+# because they drive the same page, so that group has to stay at 1.
+DEFAULT_CONCURRENCY_LIMITS = {
+    "browser": 1,
+    "generate_proposal": 4,
+}
+DEFAULT_GROUP_LIMIT = 1
+
+def parse_concurrency_limits(value: str | None) -> dict[str, int]:
+    """Parse TASK_CONCURRENCY, e.g. "generate_proposal=8,browser=1"."""
+    limits = dict(DEFAULT_CONCURRENCY_LIMITS)
+    if not value:
+        return limits
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        group, _, limit = item.partition("=")
+        limits[group.strip()] = int(limit)
+    return limits
+
+# Handlers get the claimed row and a cancellation token to check between steps,
+# and may return a JSON-serialisable result for task_queue.result
+TaskHandler = Callable[[dict, CancellationToken], Awaitable[object]]
+
+class WorkerSupervisor:
+    """
+    Consumes task_queue with up to `num_consumers` tasks in flight, never
+    exceeding the per-group limit. Only task types with a free slot are
+    claimed, so a busy browser does not hold up LLM or DB-only work.
+    """
+    def __init__(self, worker_id: str, num_consumers: int = WORKER_CONSUMERS, limits: dict[str, int] | None = None):
+        self.worker_id = worker_id
+        self.num_consumers = num_consumers
+        self.limits = limits if limits is not None else parse_concurrency_limits(os.getenv("TASK_CONCURRENCY"))
+        self.handlers: dict[str, TaskHandler] = {}
+        self.groups: dict[str, str] = {}
+        self.in_flight: dict[str, int] = defaultdict(int)
+        self.running: dict[int, asyncio.Task] = {}
+        self.running_types: dict[int, str] = {}
+        self.cancel_tokens: dict[int, CancellationToken] = {}
+        self.wakeup = asyncio.Event()
+        self.listener = QueueListener(TASK_QUEUE_CHANNEL, event=self.wakeup)
+        self.cancellations = TaskEventBroadcaster(TASK_CANCEL_CHANNEL)
+        self._cancel_watcher: asyncio.Task | None = None
+
+    def register(self, task_type: str, handler: TaskHandler, group: str | None = None):
+        self.handlers[task_type] = handler
+        self.groups[task_type] = group or task_type
+
+    def group_limit(self, group: str) -> int:
+        return self.limits.get(group, DEFAULT_GROUP_LIMIT)
+
+    def available_task_types(self) -> list[str]:
+        return [
+            task_type for task_type, group in self.groups.items()
+            if self.in_flight[group] < self.group_limit(group)
+        ]
+
+    def stats(self) -> dict:
+        groups = sorted(set(self.groups.values()))
+        return {
+            "worker_id": self.worker_id,
+            "consumers": self.num_consumers,
+            "in_flight_total": len(self.running),
+            "groups": {
+                group: {"in_flight": self.in_flight[group], "limit": self.group_limit(group)}
+                for group in groups
+            },
+            "running": [
+                {
+                    "task_id": task_id,
+                    "task_type": task_type,
+                    "cancelling": task_id in self.cancel_tokens and self.cancel_tokens[task_id].cancelled,
+                }
+                for task_id, task_type in self.running_types.items()
+            ],
+        }
+
+    async def run(self):
+        status, msg = await self.listener.connect()
+        print(msg)
+        self._cancel_watcher = asyncio.create_task(self.watch_cancellations())
+        try:
+            while True:
+                try:
+                    await self.dispatch()
+                except Exception as e:
+                    print(f"Error in worker supervisor: {e}")
+                    traceback.print_exc()
+                await self.wait()
+        finally:
+            await self.stop()
+
+    async def watch_cancellations(self):
+        """Relay cancel requests for tasks running in this process to their tokens."""
+        queue = await self.cancellations.subscribe()
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), CANCEL_LISTEN_RETRY)
+                except asyncio.TimeoutError:
+                    # The lease heartbeat still picks up cancellations while this is down
+                    await self.cancellations.ensure_connected()
+                    continue
+                self.request_cancel(event.get("id"))
+        finally:
+            self.cancellations.unsubscribe(queue)
+            await self.cancellations.close()
+
+    def request_cancel(self, task_id: int, reason: str = "Cancelled by user"):
+        token = self.cancel_tokens.get(task_id)
+        if token:
+            print(f"Cancellation requested for task {task_id}")
+            token.cancel(reason)
+
+    async def dispatch(self):
+        """Claim tasks back to back until the queue is empty or every slot is taken."""
+        while len(self.running) < self.num_consumers:
+            task_types = self.available_task_types()
+            if not task_types:
+                return
+            status, task = await get_next_task(self.worker_id, task_types=task_types)
+            if not status:
+                return
+            self.start(task)
+
+    async def wait(self):
+        # Delayed tasks (retries) do not NOTIFY when they become ready, so never
+        # sleep past the earliest run_at among the types we could take.
+        task_types = self.available_task_types() if len(self.running) < self.num_consumers else []
+        next_run_in = await get_next_run_in(task_types) if task_types else None
+        if self.listener.connected:
+            await self.listener.wait(timeout=next_run_in)
+            return
+        # Notification connection is down - poll slowly until it comes back.
+        timeout = QUEUE_POLL_INTERVAL if next_run_in is None else min(next_run_in, QUEUE_POLL_INTERVAL)
+        try:
+            await asyncio.wait_for(self.wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self.wakeup.clear()
+        status, msg = await self.listener.connect()
+        if status:
+            print(msg)
+
+    def start(self, task: dict):
+        group = self.groups[task["task_type"]]
+        self.in_flight[group] += 1
+        self.running_types[task["id"]] = task["task_type"]
+        self.running[task["id"]] = asyncio.create_task(self.execute(task, group))
+
+    async def run_handler(self, task: dict, token: CancellationToken, group: str):
+        """
+        Run the task's handler. Handlers are expected to stop on their own once
+        the token is cancelled; one that is still running CANCEL_GRACE_SECONDS
+        later is cancelled outright so it cannot hold its slot indefinitely.
+        Browser handlers are never cancelled outright: they share one page and
+        are the only ones that can leave it ready for the next browser task.
+        """
+        handler_task = asyncio.create_task(self.handlers[task["task_type"]](task, token))
+        cancel_wait = asyncio.create_task(token.wait())
+        try:
+            await asyncio.wait({handler_task, cancel_wait}, return_when=asyncio.FIRST_COMPLETED)
+            if not handler_task.done() and group in NO_HARD_CANCEL_GROUPS:
+                print(f"Task {task['id']} cancelled; waiting for its {group} handler to finish cleaning up")
+                await asyncio.shield(handler_task)
+            elif not handler_task.done():
+                try:
+                    await asyncio.wait_for(asyncio.shield(handler_task), CANCEL_GRACE_SECONDS)
+                except asyncio.TimeoutError:
+                    raise TaskCancelledError(
+                        f"{token.reason} (handler did not stop within {CANCEL_GRACE_SECONDS}s)",
+                        context={"task_id": task["id"]}
+                    )
+            return handler_task.result()
+        finally:
+            cancel_wait.cancel()
+            if not handler_task.done():
+                handler_task.cancel()
+                await asyncio.gather(handler_task, return_exceptions=True)
+
+    async def execute(self, task: dict, group: str):
+        task_id = task["id"]
+        lease = TaskLease(task_id, self.worker_id)
+        self.cancel_tokens[task_id] = lease.cancel_token
+        try:
+            print(f"Processing task {task_id}: {task['task_type']} for user: {task['username']}")
+            async with lease:
+                result = await self.run_handler(task, lease.cancel_token, group)
+            await complete_task(task_id, self.worker_id, result=result)
+        except asyncio.CancelledError:
+            # Left in 'processing'; the reaper requeues it once the lease expires.
+            raise
+        except Exception as e:
+            if lease.lost:
+                # The task belongs to whoever the reaper handed it to; leave its row alone
+                print(f"Task {task_id} stopped after losing its lease")
+                return
+            if isinstance(e, TaskCancelledError) or lease.cancel_token.cancelled:
+                # Whatever the handler raised on its way out, the task was cancelled, not failed
+                print(f"Task {task_id} cancelled")
+                await complete_task(task_id, self.worker_id, status="cancelled", result={"message": lease.cancel_token.reason or str(e)})
+                return
+            print(f"Error processing task {task_id}: {e}")
+            traceback.print_exc()
+            status, result = await fail_task(task_id, self.worker_id, error=str(e) or type(e).__name__)
+            print(result["message"] if status else result)
+        finally:
+            self.in_flight[group] -= 1
+            self.running.pop(task_id, None)
+            self.running_types.pop(task_id, None)
+            self.cancel_tokens.pop(task_id, None)
+            self.wakeup.set()
+
+    async def stop(self):
+        if self._cancel_watcher:
+            self._cancel_watcher.cancel()
+            await asyncio.gather(self._cancel_watcher, return_exceptions=True)
+        for running_task in list(self.running.values()):
+            running_task.cancel()
+        await asyncio.gather(*self.running.values(), return_exceptions=True)
+        await self.listener.close()
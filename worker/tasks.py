@@ -0,0 +1,144 @@
+import asyncio
+import json
+import os
+import pickle
+from functools import partial
+
+from state import AppState
+from upwork_agent.scrape_jobs import ScraperSession
+from upwork_agent.application import ApplicationSession
+from upwork_agent.bidder_agent import generate_proposal_for_job
+from upwork_agent.bulk_generation import GENERATE_PROPOSAL_TASK
+from db.generation_runs import record_generation_result
+from db.jobs import change_proposal_generation_status, reset_failed_generation
+from utils.cancellation import CancellationToken
+from utils.exceptions import TaskFailedError, TaskCancelledError
+from utils.openai_governor import llm_priority, BACKGROUND
+from worker.supervisor import WorkerSupervisor
+
+LOGIN_USERNAME = os.getenv("UPWORK_USERNAME")
+LOGIN_PASSWORD = os.getenv("UPWORK_PASSWORD")
+SECURITY_QUESTION_ANSWER = os.getenv("UPWORK_SECURITY_QUESTION_ANSWER")
+
+latest_urls_path = 'state_data/latest_links.pkl'
+
+def load_latest_urls():
+    if os.path.exists(latest_urls_path):
+        print("Loading latest URLs from", latest_urls_path)
+        with open(latest_urls_path, 'rb') as f:
+            latest_urls = pickle.load(f)
+        print("Latest URLs loaded:", latest_urls)
+        return latest_urls
+    print("No latest URLs file found, initializing with None values.")
+    return {
+        "Frontend" : None,
+        "Backend" : None,
+        "Fullstack" : None,
+        "Mobile" : None,
+        "AI/ML" : None,
+        "GenAI" : None,
+        "Devops" : None,
+        "IOT" : None,
+        "Low code/No code" : None,
+        "Non Tech" : None,
+        "Data Engineering" : None,
+        "Business Intelligence" : None,
+        "Best Match" : None
+    }
+
+def parse_payload(task:dict) -> dict:
+    payload_string = task.get("payload","")
+    return json.loads(payload_string) if payload_string else {}
+
+async def check_for_jobs(state:AppState, task_id:int, cancel_token:CancellationToken = None):
+    session = ScraperSession(
+            task_id=task_id,
+            page = state.page, 
+            links_to_visit=state.filter_urls, 
+            last_links=state.latest_urls, 
+            username= LOGIN_USERNAME, 
+            password=LOGIN_PASSWORD, 
+            security_answer=SECURITY_QUESTION_ANSWER,
+            cancel_token=cancel_token
+        )
+    if not await session.run():
+        raise TaskFailedError(session.status.get("message", "Scraping session failed"), context={"task_id": task_id})
+    return {"new_jobs": session.job_counter.get_count()}
+
+async def apply_for_job(state:AppState, task_id:int, job_url: str, human:str = "Unable to verify", cancel_token:CancellationToken = None):
+    session = ApplicationSession(
+            task_id = task_id,
+            page = state.page, 
+            job_url=job_url,
+            username= LOGIN_USERNAME, 
+            password=LOGIN_PASSWORD, 
+            security_answer=SECURITY_QUESTION_ANSWER, 
+            human=human,
+            cancel_token=cancel_token
+        )
+    if not await session.run():
+        raise TaskFailedError(session.status.get("message", "Application session failed"), context={"task_id": task_id, "job_url": job_url})
+    return {"job_url": job_url, "applied": session.applied, "message": session.status.get("message")}
+
+async def handle_check_for_jobs(state:AppState, task:dict, cancel_token:CancellationToken):
+    return await check_for_jobs(state, task_id=task['id'], cancel_token=cancel_token)
+
+async def handle_apply_for_job(state:AppState, task:dict, cancel_token:CancellationToken):
+    job_url = parse_payload(task).get("job_url")
+    print(f"Job URL from task payload: {job_url}")
+    if not job_url:
+        raise TaskFailedError("apply_for_job task has no job_url in its payload", context={"task_id": task['id']})
+    return await apply_for_job(state, task_id=task['id'], job_url=job_url, human=task['username'], cancel_token=cancel_token)
+
+async def handle_generate_proposal(state:AppState, task:dict, cancel_token:CancellationToken):
+    payload = parse_payload(task)
+    job_url = payload.get("job_url")
+    run_id = payload.get("run_id")
+    previous_status = payload.get("previous_status")
+    if not job_url:
+        raise TaskFailedError("generate_proposal task has no job_url in its payload", context={"task_id": task['id']})
+    cancel_token.raise_if_cancelled()
+    if run_id:
+        # Bulk runs yield OpenAI capacity to single, user-requested generations
+        llm_priority.set(BACKGROUND)
+    await change_proposal_generation_status(job_url, "processing")
+    try:
+        status, message = await generate_proposal_for_job(
+            state, job_url, replace=payload.get("replace", False), task_id=task['id'], previous_status=previous_status
+        )
+    except asyncio.CancelledError:
+        if cancel_token.superseded:
+            raise
+        # Worker shutdown (the task is requeued and marks the job again) or a
+        # forced cancel after the grace period, which ends the task for good
+        await reset_failed_generation(job_url, previous_status)
+        if cancel_token.cancelled and run_id:
+            await record_generation_result(run_id, False)
+        raise
+    if cancel_token.superseded:
+        # Another worker owns the task now and reports its outcome
+        raise TaskCancelledError(cancel_token.reason, context={"task_id": task['id'], "job_url": job_url})
+    if cancel_token.cancelled and not status:
+        await reset_failed_generation(job_url, previous_status)
+        if run_id:
+            await record_generation_result(run_id, False)
+        raise TaskCancelledError(cancel_token.reason, context={"task_id": task['id'], "job_url": job_url})
+    if not status:
+        # Only the last attempt gives up on the job; earlier ones are retried with backoff
+        if task["attempts"] >= task["max_attempts"]:
+            await reset_failed_generation(job_url, previous_status)
+            if run_id:
+                await record_generation_result(run_id, False)
+        raise TaskFailedError(message, context={"task_id": task['id'], "job_url": job_url})
+    if run_id:
+        await record_generation_result(run_id, True)
+    return {"job_url": job_url, "message": message}
+
+def build_worker_supervisor(state:AppState, worker_id:str) -> WorkerSupervisor:
+    supervisor = WorkerSupervisor(worker_id=worker_id)
+    # Both drive state.page, so they share the single browser slot.
+    supervisor.register("check_for_jobs", partial(handle_check_for_jobs, state), group="browser")
+    supervisor.register("apply_for_job", partial(handle_apply_for_job, state), group="browser")
+    # LLM-bound, limited separately (DEFAULT_CONCURRENCY_LIMITS / TASK_CONCURRENCY)
+    supervisor.register(GENERATE_PROPOSAL_TASK, partial(handle_generate_proposal, state))
+    return supervisor